@@ -1,26 +1,576 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, CursorType, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
 import os
+import re
 import logging
+import logging.handlers
+import cProfile
+import io
+import pstats
+import random
+import socket
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, NamedTuple, Optional, Tuple
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import csv
+import bisect
+import threading
+import time
 import uuid
+import secrets
+import base64
+import json
+import hashlib
+import orjson
+import numpy as np
 from datetime import datetime, timezone, timedelta
 import bcrypt
+import jwt
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Prometheus metrics. Kept in-process and rendered in the text exposition
+# format on /metrics; updated from Motor's threads, hence the locks.
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for labels, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    result.append((f"{self.name}_bucket", labels + (le,), cumulative))
+                result.append((f"{self.name}_sum", labels, total))
+                result.append((f"{self.name}_count", labels, count))
+        return result
+
+def render_metrics(metrics) -> str:
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            labelnames = metric.labelnames + (("le",) if name.endswith("_bucket") else ())
+            label_text = ",".join(f'{k}="{v}"' for k, v in zip(labelnames, labels))
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 25, 100)
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+http_request_size = Histogram("http_request_size_bytes", "HTTP request body size", ("method", "route"), SIZE_BUCKETS)
+http_response_size = Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+request_mongo_commands = Histogram("http_request_mongo_commands", "Mongo commands issued per HTTP request", ("method", "route"), COUNT_BUCKETS)
+request_mongo_seconds = Histogram("http_request_mongo_seconds", "Time spent in Mongo per HTTP request", ("method", "route"), LATENCY_BUCKETS)
+mongo_commands = Counter("mongo_commands_total", "Mongo commands by name and outcome", ("command", "outcome"))
+mongo_latency = Histogram("mongo_command_duration_seconds", "Mongo command latency", ("command",), LATENCY_BUCKETS)
+auth_latency = Histogram("auth_duration_seconds", "Time spent authenticating requests in get_current_user", (), LATENCY_BUCKETS)
+
+METRICS = [
+    http_requests, http_latency, http_in_flight, http_request_size, http_response_size,
+    request_mongo_commands, request_mongo_seconds, mongo_commands, mongo_latency, auth_latency,
+]
+
+# Per-request counters, visible to the command listener because Motor copies
+# the context into its executor threads
+request_stats = ContextVar("request_stats", default=None)
+
+def query_shape(value):
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [query_shape(value[0])] if value else []
+    return "?"
+
+def command_filter(command_name: str, command: dict):
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or [{}]
+        return statements[0].get("q")
+    if command_name == "aggregate":
+        return command.get("pipeline")
+    return command.get("filter", command.get("query"))
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        stats = request_stats.get()
+        if stats is not None and stats.get("timeline") is not None:
+            stats["timeline_pending"][event.request_id] = {
+                "command": event.command_name,
+                "collection": event.command.get(event.command_name),
+                "filter": query_shape(command_filter(event.command_name, event.command)),
+                "offset_ms": round((time.perf_counter() - stats["start"]) * 1000, 2),
+            }
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        mongo_commands.inc(event.command_name, outcome)
+        mongo_latency.observe(seconds, event.command_name)
+        stats = request_stats.get()
+        if stats is not None:
+            stats["mongo_commands"] += 1
+            stats["mongo_seconds"] += seconds
+            entry = stats.get("timeline_pending", {}).pop(event.request_id, None)
+            if entry is not None:
+                stats["timeline"].append({**entry, "duration_ms": round(seconds * 1000, 2), "outcome": outcome})
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        stats = {
+            "mongo_commands": 0,
+            "mongo_seconds": 0.0,
+            "request_bytes": 0,
+            "response_bytes": 0,
+            "status": 500,
+            "start": time.perf_counter(),
+        }
+        context_token = request_stats.set(stats)
+        http_in_flight.inc()
+        start = time.perf_counter()
+        
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                stats["request_bytes"] += len(message.get("body", b""))
+            return message
+        
+        async def send_counted(message):
+            if message["type"] == "http.response.start":
+                stats["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                stats["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            request_stats.reset(context_token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route else "unmatched")
+            http_requests.inc(*labels, str(stats["status"]))
+            http_latency.observe(elapsed, *labels)
+            http_request_size.observe(stats["request_bytes"], *labels)
+            http_response_size.observe(stats["response_bytes"], *labels)
+            request_mongo_commands.observe(stats["mongo_commands"], *labels)
+            request_mongo_seconds.observe(stats["mongo_seconds"], *labels)
+
+# Opt-in slow request profiling. Requests slower than SLOW_REQUEST_MS are
+# logged with their Mongo command timeline; PROFILE_SAMPLE_RATE of them also
+# run under cProfile. cProfile sees the whole event loop thread, so a sampled
+# profile includes whatever other requests were interleaved with it.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0.01'))
+PROFILE_LOG_PATH = Path(os.environ.get('PROFILE_LOG_PATH', str(ROOT_DIR / 'slow_requests.log')))
+PROFILE_LOG_MAX_BYTES = int(os.environ.get('PROFILE_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+PROFILE_LOG_BACKUPS = int(os.environ.get('PROFILE_LOG_BACKUPS', '5'))
+
+slow_request_log = logging.getLogger("shiftsync.slow_requests")
+slow_request_log.propagate = False
+
+# Long-lived responses: their duration is the client's, not the server's,
+# and a profiler left running for them would block sampling everything else
+STREAMING_PATHS = {"/api/shifts/events", "/api/shifts/export", "/api/shifts/range"}
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._profiling = False
+        handler = logging.handlers.RotatingFileHandler(
+            PROFILE_LOG_PATH, maxBytes=PROFILE_LOG_MAX_BYTES, backupCount=PROFILE_LOG_BACKUPS
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        slow_request_log.addHandler(handler)
+        slow_request_log.setLevel(logging.INFO)
+
+    async def __call__(self, scope, receive, send):
+        stats = request_stats.get()
+        if scope["type"] != "http" or stats is None or scope["path"] in STREAMING_PATHS:
+            return await self.app(scope, receive, send)
+        
+        stats["timeline"] = []
+        stats["timeline_pending"] = {}
+        profiler = None
+        streaming = False
+        # Only one cProfile can be active per thread
+        if not self._profiling and random.random() < PROFILE_SAMPLE_RATE:
+            self._profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        
+        def stop_profiler():
+            nonlocal profiler
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+                profiler = None
+        
+        # Event streams on other routes are only recognised by their content type
+        async def send_checked(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if headers.get(b"content-type", b"").startswith(b"text/event-stream"):
+                    streaming = True
+                    stop_profiler()
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_checked)
+        finally:
+            # Read before stopping, which drops the reference
+            sampled = profiler
+            stop_profiler()
+            elapsed_ms = (time.perf_counter() - stats["start"]) * 1000
+            if elapsed_ms >= SLOW_REQUEST_MS and not streaming:
+                route = scope.get("route")
+                record = {
+                    "time": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "route": route.path if route else "unmatched",
+                    "path": scope["path"],
+                    "status": stats["status"],
+                    "duration_ms": round(elapsed_ms, 2),
+                    "mongo_commands": stats["mongo_commands"],
+                    "mongo_ms": round(stats["mongo_seconds"] * 1000, 2),
+                    "timeline": stats["timeline"],
+                }
+                if sampled:
+                    output = io.StringIO()
+                    pstats.Stats(sampled, stream=output).sort_stats("cumulative").print_stats(30)
+                    record["profile"] = output.getvalue()
+                slow_request_log.info(json.dumps(record))
+
+def tail_lines(path: Path, count: int, block_size: int = 64 * 1024) -> List[bytes]:
+    """Last count lines of a file, reading backwards from its end"""
+    with path.open("rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # One newline more than asked for, so the first line kept is whole
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data.splitlines()[-count:]
+
+def read_slow_requests(limit: int) -> List[dict]:
+    """Newest records first; blocking file IO, run it in an executor"""
+    paths = [PROFILE_LOG_PATH] + [
+        PROFILE_LOG_PATH.with_name(f"{PROFILE_LOG_PATH.name}.{i}") for i in range(1, PROFILE_LOG_BACKUPS + 1)
+    ]
+    records = []
+    for path in paths:
+        if len(records) >= limit or not path.exists():
+            break
+        lines = tail_lines(path, limit - len(records))
+        records.extend(json.loads(line) for line in reversed(lines))
+    return records
+
+# Mongo connection pool. The client is created in the lifespan handler and
+# warmed up before /readyz reports ready.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+
+client = None
+db = None
+ready = False
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[MongoCommandMetrics()],
+    )
+
+async def warm_up_pool():
+    # Concurrent pings check out MONGO_MIN_POOL_SIZE connections at once, so
+    # the first requests after a deploy don't pay for connection setup
+    await db.command("ping")
+    await asyncio.gather(*(db.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)))
+
+async def prepare_database():
+    global ready
+    await warm_up_pool()
+    await ensure_indexes()
+    await load_revoked_tokens()
+    await store_cache.load()
+    await backfill_rollups()
+    ready = True
+    logger.info("Database ready, pool warmed with %d connections", MONGO_MIN_POOL_SIZE)
+
+async def backfill_rollups():
+    # Weeks with shifts but no rollup, e.g. written before rollups existed,
+    # would otherwise have their first change $inc'ed onto nothing
+    weeks = [
+        (group["_id"]["store_id"], group["_id"]["week_start"])
+        async for group in db.shifts.aggregate([
+            {"$group": {"_id": {"store_id": "$store_id", "week_start": "$week_start"}}},
+        ], allowDiskUse=True)
+    ]
+    stored = {doc["_id"] async for doc in db.shift_rollups.find({}, {"_id": 1})}
+    missing = [week for week in weeks if rollup_id(*week) not in stored]
+    rebuilt = 0
+    for start in range(0, len(missing), STREAM_BATCH_SIZE):
+        chunk = missing[start:start + STREAM_BATCH_SIZE]
+        result = await rebuild_rollups({
+            "$or": [{"store_id": store_id, "week_start": week_start} for store_id, week_start in chunk]
+        })
+        rebuilt += result["rebuilt"]
+    if rebuilt:
+        logger.info("Backfilled %d missing rollups", rebuilt)
+
+async def prepare_database_until_ready():
+    while True:
+        try:
+            await prepare_database()
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Database not ready, retrying: %s", e)
+            await asyncio.sleep(2)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    client = create_mongo_client()
+    db = client[os.environ['DB_NAME']]
+    
+    background_tasks = [
+        asyncio.create_task(prepare_database_until_ready()),
+        asyncio.create_task(refresh_store_cache_periodically()),
+    ]
+    if SHIFT_EVENTS_SOURCE == "changestream":
+        background_tasks.append(asyncio.create_task(watch_shift_changes()))
+    if CACHE_BROADCAST == "capped":
+        background_tasks.append(asyncio.create_task(cache_broadcast.listen()))
+    
+    # Give the warm-up a head start so a healthy deploy is ready on first request
+    await asyncio.wait(background_tasks[:1], timeout=MONGO_SERVER_SELECTION_TIMEOUT_MS / 1000)
+    
+    yield
+    
+    for task in background_tasks:
+        task.cancel()
+    client.close()
+    password_hasher.shutdown()
 
-app = FastAPI()
+# Signed bearer tokens. Set JWT_SECRET in production; the random fallback
+# invalidates every token on restart and is refused with several workers.
+JWT_SECRET = os.environ.get('JWT_SECRET') or secrets.token_hex(32)
+JWT_ALGORITHM = "HS256"
+JWT_TTL_SECONDS = int(os.environ.get('JWT_TTL_SECONDS', '43200'))
+# Lifetime of the single-week tokens EventSource passes in the query string
+STREAM_TOKEN_TTL_SECONDS = int(os.environ.get('STREAM_TOKEN_TTL_SECONDS', '60'))
+
+# Password hashing runs on a bounded thread pool (bcrypt releases the GIL)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '4'))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', '32'))
+
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '500'))
+# Longest single line an import accepts, so a file without newlines can't
+# grow the parse buffer without bound
+IMPORT_MAX_LINE_BYTES = int(os.environ.get('IMPORT_MAX_LINE_BYTES', str(1024 * 1024)))
+
+# Shift change feed: "local" publishes from this process's handlers,
+# "changestream" tails db.shifts so writes from any process are seen.
+SHIFT_EVENTS_SOURCE = os.environ.get('SHIFT_EVENTS_SOURCE', 'local')
+SHIFT_EVENTS_QUEUE_SIZE = int(os.environ.get('SHIFT_EVENTS_QUEUE_SIZE', '256'))
+SHIFT_EVENTS_KEEPALIVE = float(os.environ.get('SHIFT_EVENTS_KEEPALIVE', '15'))
+
+# How often the store cache checks the stores version counter for changes
+STORE_CACHE_REFRESH_SECONDS = float(os.environ.get('STORE_CACHE_REFRESH_SECONDS', '30'))
+
+# Auto roster: weekly hour cap per user and the extra cost of a second
+# shift on the same day, in minutes, so the load spreads across days
+ROSTER_MAX_HOURS = float(os.environ.get('ROSTER_MAX_HOURS', '40'))
+ROSTER_SAME_DAY_PENALTY = float(os.environ.get('ROSTER_SAME_DAY_PENALTY', '240'))
+
+# Cross-worker cache invalidation: "none" keeps every cache process-local
+# (one worker), "capped" broadcasts changes through a tailable capped
+# collection so all workers of a gunicorn/uvicorn --workers deployment agree.
+CACHE_BROADCAST = os.environ.get('CACHE_BROADCAST', 'none')
+CACHE_BROADCAST_SIZE_BYTES = int(os.environ.get('CACHE_BROADCAST_SIZE_BYTES', str(16 * 1024 * 1024)))
+
+# Every worker signs with its own random key unless JWT_SECRET is shared, so a
+# token would only be accepted by the worker that issued it
+if CACHE_BROADCAST != "none" and not os.environ.get('JWT_SECRET'):
+    raise RuntimeError("JWT_SECRET must be set when CACHE_BROADCAST shares caches between workers")
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
+# Shifts in these statuses occupy their slot
+ACTIVE_STATUSES = ["pending", "approved"]
+
+# Indexes for every query shape the API issues. The shifts slot index also
+# serves the (store_id, week_start) week fetch through its prefix.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "stores": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "shifts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset order for the streaming range query
+        IndexModel(
+            [("store_id", ASCENDING), ("week_start", ASCENDING), ("id", ASCENDING)],
+            name="store_week_id",
+        ),
+        # A user's shifts in a week, for the overlap index
+        IndexModel([("user_id", ASCENDING), ("week_start", ASCENDING)], name="user_week"),
+        # At most one active shift per slot; needs MongoDB 6.0+ for $in
+        IndexModel(
+            [
+                ("store_id", ASCENDING),
+                ("week_start", ASCENDING),
+                ("day_of_week", ASCENDING),
+                ("time_slot", ASCENDING),
+            ],
+            name="active_slot_unique",
+            unique=True,
+            partialFilterExpression={"status": {"$in": ACTIVE_STATUSES}},
+        ),
+    ],
+    "shift_templates": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("store_id", ASCENDING)], name="store_id"),
+    ],
+    "shift_rollups": [
+        IndexModel([("week_start", ASCENDING), ("store_id", ASCENDING)], name="week_store"),
+    ],
+    "revoked_tokens": [
+        IndexModel([("jti", ASCENDING)], name="jti_unique", unique=True),
+        IndexModel([("exp", ASCENDING)], name="exp"),
+    ],
+}
+
+# Representative filters used to explain each query shape
+QUERY_SHAPES = [
+    ("users", "login", {"email": "probe@example.com"}),
+    ("users", "refresh_token", {"id": "probe"}),
+    ("shifts", "get_shifts", {"store_id": "probe", "week_start": "1970-01-05"}),
+    ("shifts", "shift_by_id", {"id": "probe"}),
+    ("shifts", "get_shifts_range", {
+        "store_id": {"$in": ["probe"]},
+        "week_start": {"$gte": "1970-01-05", "$lte": "1970-02-02"},
+    }),
+    # Only active shifts hold a slot, so this is answered by active_slot_unique
+    ("shifts", "slot_conflict", {
+        "store_id": "probe",
+        "week_start": "1970-01-05",
+        "day_of_week": 0,
+        "time_slot": "00:00 - 00:00",
+        "status": {"$in": ACTIVE_STATUSES},
+    }),
+    ("shifts", "user_week_shifts", {
+        "user_id": "probe",
+        "week_start": "1970-01-05",
+        "status": {"$in": ACTIVE_STATUSES},
+    }),
+    ("shift_rollups", "report_range", {
+        "week_start": {"$gte": "1970-01-05", "$lte": "1970-02-02"},
+        "store_id": {"$in": ["probe"]},
+    }),
+    ("revoked_tokens", "load_revoked_tokens", {"exp": {"$lt": 0}}),
+]
+
+# Shapes that must be served by one particular index
+SHAPE_INDEXES = {
+    "slot_conflict": "active_slot_unique",
+}
+
 # Models
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -38,14 +588,14 @@ class Store(BaseModel):
 
 class ShiftCreate(BaseModel):
     store_id: str
-    day_of_week: int
+    day_of_week: int = Field(ge=0, le=6)
     time_slot: str
     shift_type: str
     notes: Optional[str] = ""
     week_start: str
 
 class ShiftUpdate(BaseModel):
-    day_of_week: Optional[int] = None
+    day_of_week: Optional[int] = Field(None, ge=0, le=6)
     time_slot: Optional[str] = None
     shift_type: Optional[str] = None
     notes: Optional[str] = None
@@ -64,116 +614,2601 @@ class Shift(BaseModel):
     week_start: str
     created_at: str
 
-class LoginRequest(BaseModel):
-    email: str
-    password: str
+# Shift reads project to the model's fields: responses built from them skip
+# validation, so anything else stored on a shift (invalid_reason from
+# /shifts/flag-invalid, fields of older schemas) would otherwise be served
+SHIFT_PROJECTION = {"_id": 0, **{field: 1 for field in Shift.model_fields}}
+
+class LoginRequest(BaseModel):
+    email: str
+    password: str
+
+class ConflictCheck(BaseModel):
+    store_id: str
+    day_of_week: int = Field(ge=0, le=6)
+    time_slot: str
+    week_start: str
+    exclude_shift_id: Optional[str] = None
+
+class SlotRef(BaseModel):
+    day_of_week: int = Field(ge=0, le=6)
+    time_slot: str
+
+class ConflictBatchCheck(BaseModel):
+    store_id: str
+    week_start: str
+    slots: Optional[List[SlotRef]] = None
+    exclude_shift_id: Optional[str] = None
+
+class ShiftBatchCreate(BaseModel):
+    shifts: List[ShiftCreate]
+
+class ShiftIdBatch(BaseModel):
+    shift_ids: List[str]
+
+class RosterRequest(BaseModel):
+    store_ids: List[str] = Field(min_length=1)
+    week_starts: List[str] = Field(min_length=1)
+    max_hours_per_user: float = Field(ROSTER_MAX_HOURS, gt=0)
+    dry_run: bool = False
+
+class TemplateShift(BaseModel):
+    user_id: str
+    day_of_week: int = Field(ge=0, le=6)
+    time_slot: str
+    shift_type: str = "morning"
+    notes: Optional[str] = ""
+
+class ShiftTemplateCreate(BaseModel):
+    name: str
+    store_id: str
+    # Either list the shifts (applied as approved) or take the active ones of
+    # an existing week with their status
+    from_week: Optional[str] = None
+    shifts: Optional[List[TemplateShift]] = None
+
+class TemplateApply(BaseModel):
+    week_starts: Optional[List[str]] = Field(None, min_length=1, max_length=52)
+    start_week: Optional[str] = None
+    weeks: int = Field(1, ge=1, le=52)
+
+class WeekCopy(BaseModel):
+    store_id: str
+    week_start: str
+    # Defaults to the `weeks` weeks right after week_start
+    week_starts: Optional[List[str]] = Field(None, min_length=1, max_length=52)
+    weeks: int = Field(1, ge=1, le=52)
+
+# In-process TTL/LRU cache
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def peek(self, key):
+        # No stats, no LRU bump, no expiry check
+        entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('USER_CACHE_TTL', '60')),
+)
+
+# Password hashing pool
+class PasswordHasher:
+    def __init__(self, workers: int, max_queue: int, rounds: int):
+        self.rounds = rounds
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self.timings = {"hash": [0, 0.0, 0.0], "check": [0, 0.0, 0.0]}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._workers = workers
+
+    def _timed(self, op: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stat = self.timings[op]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+
+    async def _run(self, op: str, fn, *args):
+        # in_flight counts both running and queued jobs
+        if self.in_flight >= self._workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many concurrent logins, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, op, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def _check(self, password: str, password_hash: str) -> bool:
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self._hash, password)
+
+    async def check(self, password: str, password_hash: str) -> bool:
+        return await self._run("check", self._check, password, password_hash)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self._workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            **{
+                op: {
+                    "count": count,
+                    "avg_ms": round(total / count, 2) if count else 0.0,
+                    "max_ms": round(peak, 2),
+                }
+                for op, (count, total, peak) in self.timings.items()
+            },
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(
+    workers=BCRYPT_WORKERS,
+    max_queue=BCRYPT_MAX_QUEUE,
+    rounds=BCRYPT_ROUNDS,
+)
+
+# Token revocation: jti -> exp, mirrored to db.revoked_tokens so it survives restarts.
+# Tokens issued before tokens_not_before (bumped by /api/seed) are rejected as well.
+revoked_tokens = {}
+tokens_not_before = 0.0
+
+def issue_token(user: User) -> str:
+    now = time.time()
+    claims = {
+        "sub": user.id,
+        "name": user.name,
+        "email": user.email,
+        "role": user.role,
+        "store_ids": user.store_ids,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": int(now) + JWT_TTL_SECONDS,
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_token(token: str) -> dict:
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    # Stream tokens only open the event stream they were issued for
+    if claims.get("scope"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if session_revoked(claims["jti"], claims["iat"]):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    
+    return claims
+
+def session_revoked(jti: str, issued_at: float) -> bool:
+    return jti in revoked_tokens or issued_at < tokens_not_before
+
+def issue_stream_token(user: User, session: str, store_id: str, week_start: str) -> str:
+    now = time.time()
+    claims = {
+        "sub": user.id,
+        "scope": "shift_events",
+        # jti of the login token, so logging out also ends the stream
+        "session": session,
+        "store_id": store_id,
+        "week_start": week_start,
+        "iat": now,
+        "exp": int(now) + STREAM_TOKEN_TTL_SECONDS,
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_stream_token(token: str, store_id: str, week_start: str) -> dict:
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if (
+        claims.get("scope") != "shift_events"
+        or claims["store_id"] != store_id
+        or claims["week_start"] != week_start
+        or session_revoked(claims["session"], claims["iat"])
+    ):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    return claims
+
+def bearer_token(authorization: Optional[str]) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return authorization.replace("Bearer ", "")
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> User:
+    user, _, _ = await current_session(authorization)
+    return user
+
+async def current_session(authorization: Optional[str]) -> Tuple[User, str, float]:
+    """The caller with their token's jti and issue time"""
+    start = time.perf_counter()
+    try:
+        token = bearer_token(authorization)
+        cached = user_cache.get(token)
+        if cached is not None:
+            user, jti, issued_at = cached
+            # Revocations can arrive from other workers without evicting this entry
+            if session_revoked(jti, issued_at):
+                raise HTTPException(status_code=401, detail="Token revoked")
+            return cached
+        
+        claims = decode_token(token)
+        user = User(
+            id=claims["sub"],
+            name=claims["name"],
+            email=claims["email"],
+            role=claims["role"],
+            store_ids=claims["store_ids"],
+        )
+        session = (user, claims["jti"], claims["iat"])
+        user_cache.set(token, session, ttl=claims["exp"] - time.time())
+        return session
+    finally:
+        auth_latency.observe(time.perf_counter() - start)
+
+async def load_revoked_tokens():
+    now = int(time.time())
+    await db.revoked_tokens.delete_many({"exp": {"$lt": now}})
+    async for doc in db.revoked_tokens.find({}, {"_id": 0}):
+        revoked_tokens[doc["jti"]] = doc["exp"]
+
+# Index management
+async def ensure_indexes():
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error("Failed to create indexes on %s: %s", collection, e)
+
+async def missing_indexes() -> dict:
+    missing = {}
+    for collection, indexes in INDEXES.items():
+        existing = await db[collection].index_information()
+        existing_keys = {tuple(info["key"]) for info in existing.values()}
+        names = [
+            index.document["name"]
+            for index in indexes
+            if tuple(index.document["key"].items()) not in existing_keys
+        ]
+        if names:
+            missing[collection] = names
+    return missing
+
+def plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage")]
+    for child in plan.get("inputStages", []) + [plan.get("inputStage")]:
+        if child:
+            stages.extend(plan_stages(child))
+    return [stage for stage in stages if stage]
+
+def plan_indexes(plan: dict) -> List[str]:
+    names = [plan["indexName"]] if "indexName" in plan else []
+    for child in plan.get("inputStages", []) + [plan.get("inputStage")]:
+        if child:
+            names.extend(plan_indexes(child))
+    return names
+
+async def explain_query_shapes() -> List[dict]:
+    results = []
+    for collection, handler, query in QUERY_SHAPES:
+        explain = await db[collection].find(query).explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        stages = plan_stages(winning_plan)
+        indexes = plan_indexes(winning_plan)
+        result = {
+            "collection": collection,
+            "handler": handler,
+            "filter": list(query.keys()),
+            "stages": stages,
+            "indexes": indexes,
+            "collscan": "COLLSCAN" in stages,
+        }
+        if handler in SHAPE_INDEXES:
+            result["expected_index"] = SHAPE_INDEXES[handler]
+            result["unexpected_index"] = SHAPE_INDEXES[handler] not in indexes
+        results.append(result)
+    return results
+
+# Auth endpoints
+@api_router.post("/auth/login")
+async def login(request: LoginRequest):
+    user_doc = await db.users.find_one({"email": request.email}, {"_id": 0})
+    
+    if not user_doc:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    if not await password_hasher.check(request.password, user_doc["password_hash"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    user = User(**user_doc)
+    return {
+        "token": issue_token(user),
+        "user": user
+    }
+
+@api_router.post("/auth/refresh")
+async def refresh_token(authorization: Optional[str] = Header(None)):
+    token = bearer_token(authorization)
+    claims = decode_token(token)
+    
+    # Refresh is the one place the user record is re-read, so role and
+    # store changes take effect without a per-request query.
+    user_doc = await db.users.find_one({"id": claims["sub"]}, {"_id": 0})
+    
+    if not user_doc:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    await revoke_token(token, claims)
+    user = User(**user_doc)
+    return {
+        "token": issue_token(user),
+        "user": user
+    }
+
+@api_router.post("/auth/logout")
+async def logout(authorization: Optional[str] = Header(None)):
+    token = bearer_token(authorization)
+    claims = decode_token(token)
+    await revoke_token(token, claims)
+    return {"message": "Logged out"}
+
+async def revoke_token(token: str, claims: dict):
+    revoked_tokens[claims["jti"]] = claims["exp"]
+    user_cache.pop(token)
+    await db.revoked_tokens.insert_one({"jti": claims["jti"], "exp": claims["exp"]})
+    await cache_broadcast.publish("token_revoked", jti=claims["jti"], exp=claims["exp"])
+
+@api_router.get("/auth/me", response_model=User)
+async def get_me(authorization: Optional[str] = Header(None)):
+    return await get_current_user(authorization)
+
+# Store endpoints
+# Version counters behind ETags: one document per (store, week) for shifts
+# and one for the stores collection. They are bumped, never reset, so a
+# stale ETag can't match again after a reseed.
+STORES_VERSION_KEY = "stores"
+
+def week_version_key(store_id: str, week_start: str) -> str:
+    return f"shifts:{store_id}:{week_start}"
+
+async def get_version(key: str) -> int:
+    doc = await db.versions.find_one({"_id": key})
+    return doc["version"] if doc else 0
+
+async def bump_versions(keys) -> dict:
+    keys = set(keys)
+    docs = await asyncio.gather(*(
+        db.versions.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        for key in keys
+    ))
+    return {doc["_id"]: doc["version"] for doc in docs}
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
+
+# Fast response path for documents read from our own collections: they were
+# validated on the way in, so they are serialized with orjson and returned
+# directly, skipping FastAPI's response_model re-validation. Nothing filters
+# extra fields here; shift reads rely on SHIFT_PROJECTION for that.
+def trusted_response(content, headers: Optional[dict] = None) -> ORJSONResponse:
+    return ORJSONResponse(content, headers=headers)
+
+# Store metadata cache. Stores are loaded once at startup and reloaded when
+# the stores version counter moves, so reads never touch Mongo.
+TIME_SLOT_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+class TimeSlot(NamedTuple):
+    label: str
+    start: int  # minutes from midnight
+    end: int    # minutes from midnight, past 1440 when the slot crosses midnight
+
+def parse_time_slot(label: str) -> Optional[TimeSlot]:
+    match = TIME_SLOT_PATTERN.match(label)
+    if not match:
+        return None
+    
+    start_hour, start_minute, end_hour, end_minute = (int(part) for part in match.groups())
+    if start_hour > 23 or end_hour > 23 or start_minute > 59 or end_minute > 59:
+        return None
+    
+    start = start_hour * 60 + start_minute
+    end = end_hour * 60 + end_minute
+    if end <= start:
+        end += 24 * 60
+    return TimeSlot(label, start, end)
+
+class StoreCache:
+    def __init__(self):
+        self.version = None
+        self._stores = {}
+        self._slots = {}
+        self._stores_by_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        async with self._lock:
+            # Version first, so a concurrent change triggers another reload
+            version = await get_version(STORES_VERSION_KEY)
+            docs = await db.stores.find({}, {"_id": 0}).to_list(None)
+            self._stores = {doc["id"]: doc for doc in docs}
+            self._slots = {
+                doc["id"]: {
+                    slot.label: slot
+                    for slot in (parse_time_slot(label) for label in doc["time_slots"])
+                    if slot is not None
+                }
+                for doc in docs
+            }
+            self._stores_by_slot = defaultdict(set)
+            for doc in docs:
+                for label in doc["time_slots"]:
+                    self._stores_by_slot[label].add(doc["id"])
+            self.version = version
+
+    async def ensure_loaded(self):
+        if self.version is None:
+            await self.load()
+
+    async def refresh_if_changed(self):
+        if await get_version(STORES_VERSION_KEY) != self.version:
+            await self.load()
+
+    def get(self, store_id: str) -> Optional[dict]:
+        return self._stores.get(store_id)
+
+    def for_ids(self, store_ids: List[str]) -> List[dict]:
+        wanted = set(store_ids)
+        return [doc for store_id, doc in self._stores.items() if store_id in wanted]
+
+    def time_slots(self, store_id: str) -> dict:
+        """Parsed slots of a store keyed by their label"""
+        return self._slots.get(store_id, {})
+
+    def offers(self, store_id: str, time_slot: str) -> bool:
+        return store_id in self._stores_by_slot.get(time_slot, ())
+
+    def stores_offering(self, time_slot: str) -> List[str]:
+        return list(self._stores_by_slot.get(time_slot, ()))
+
+def invalid_slot_reason(shift_doc: dict) -> Optional[str]:
+    if store_cache.get(shift_doc.get("store_id")) is None:
+        return "unknown store"
+    if not isinstance(shift_doc.get("day_of_week"), int) or not 0 <= shift_doc["day_of_week"] <= 6:
+        return "day_of_week out of range"
+    if not store_cache.offers(shift_doc["store_id"], shift_doc.get("time_slot")):
+        return "time_slot not offered by store"
+    return None
+
+def check_slot(store_id: str, time_slot: str):
+    if not store_cache.offers(store_id, time_slot):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Time slot '{time_slot}' is not offered by store {store_id}"
+        )
+
+store_cache = StoreCache()
+
+async def refresh_store_cache_periodically():
+    while True:
+        await asyncio.sleep(STORE_CACHE_REFRESH_SECONDS)
+        try:
+            await store_cache.refresh_if_changed()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Store cache refresh failed: %s", e)
+
+@api_router.get("/stores", response_model=List[Store])
+async def get_stores(
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    await store_cache.ensure_loaded()
+    
+    etag = make_etag(store_cache.version, *sorted(user.store_ids))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    return trusted_response(store_cache.for_ids(user.store_ids), etag_headers(etag))
+
+@api_router.get("/stores/{store_id}", response_model=Store)
+async def get_store(
+    store_id: str,
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    await store_cache.ensure_loaded()
+    etag = make_etag(store_cache.version, store_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    store = store_cache.get(store_id)
+    
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+    
+    return trusted_response(store, etag_headers(etag))
+
+# Shift endpoints
+async def slot_conflict(shift_doc: dict) -> HTTPException:
+    conflicting_shift = await db.shifts.find_one(
+        {
+            "store_id": shift_doc["store_id"],
+            "week_start": shift_doc["week_start"],
+            "day_of_week": shift_doc["day_of_week"],
+            "time_slot": shift_doc["time_slot"],
+            "status": {"$in": ACTIVE_STATUSES},
+            "id": {"$ne": shift_doc["id"]},
+        },
+        SHIFT_PROJECTION
+    )
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": "Conflict detected! This slot is already taken.",
+            "conflicting_shift": conflicting_shift,
+        }
+    )
+
+# In-process pub/sub of shift deltas, scoped by (store_id, week_start)
+class ShiftEventBus:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = {}
+
+    def subscribe(self, store_id: str, week_start: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault((store_id, week_start), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, store_id: str, week_start: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get((store_id, week_start))
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[(store_id, week_start)]
+
+    def publish(self, action: str, shift_doc: dict):
+        event = {"action": action, "shift": shift_doc}
+        self.published += 1
+        for queue in self._subscribers.get((shift_doc["store_id"], shift_doc["week_start"]), ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and tell it to refetch the week
+                self.dropped += queue.qsize()
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"action": "resync"})
+
+    def stats(self) -> dict:
+        return {
+            "source": SHIFT_EVENTS_SOURCE,
+            "channels": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+shift_events = ShiftEventBus(queue_size=SHIFT_EVENTS_QUEUE_SIZE)
+
+async def watch_shift_changes():
+    actions = {"insert": "created", "update": "updated", "replace": "updated", "delete": "deleted"}
+    while True:
+        try:
+            # Deletes only carry the document when pre-images are enabled on db.shifts
+            async with db.shifts.watch(
+                full_document="updateLookup",
+                full_document_before_change="whenAvailable"
+            ) as stream:
+                async for change in stream:
+                    action = actions.get(change["operationType"])
+                    shift_doc = change.get("fullDocument") or change.get("fullDocumentBeforeChange")
+                    if action and shift_doc:
+                        # Same fields as SHIFT_PROJECTION reads
+                        shift_events.publish(action, {
+                            field: shift_doc[field] for field in Shift.model_fields if field in shift_doc
+                        })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Shift change stream failed, restarting: %s", e)
+            await asyncio.sleep(1)
+
+# Materialized week schedules: one in-memory snapshot per (store, week),
+# patched in place by shifts_changed and rendered to a grid once per change
+class WeekSchedule:
+    def __init__(self, store_id: str, week_start: str, time_slots: List[str], shift_docs: List[dict]):
+        self.store_id = store_id
+        self.week_start = week_start
+        self.time_slots = time_slots
+        self.shifts = {}
+        # (day_of_week, time_slot) -> ids of the active shifts holding it
+        self.occupancy = defaultdict(set)
+        self._rendered = None
+        for doc in shift_docs:
+            self.apply("created", doc)
+
+    def apply(self, action: str, shift_doc: dict):
+        previous = self.shifts.pop(shift_doc["id"], None)
+        if previous is not None:
+            slot = (previous["day_of_week"], previous["time_slot"])
+            self.occupancy[slot].discard(previous["id"])
+            if not self.occupancy[slot]:
+                del self.occupancy[slot]
+        
+        if action != "deleted":
+            self.shifts[shift_doc["id"]] = shift_doc
+            if shift_doc["status"] in ACTIVE_STATUSES:
+                self.occupancy[(shift_doc["day_of_week"], shift_doc["time_slot"])].add(shift_doc["id"])
+        self._rendered = None
+
+    def occupant(self, day_of_week: int, time_slot: str, exclude_shift_id: Optional[str] = None) -> Optional[dict]:
+        for shift_id in self.occupancy.get((day_of_week, time_slot), ()):
+            if shift_id != exclude_shift_id:
+                return self.shifts[shift_id]
+        return None
+
+    def grid(self) -> dict:
+        # Slots the store no longer offers still show up, after its own
+        time_slots = list(self.time_slots)
+        for doc in self.shifts.values():
+            if doc["time_slot"] not in time_slots:
+                time_slots.append(doc["time_slot"])
+        
+        days = [{slot: [] for slot in time_slots} for _ in range(7)]
+        for doc in sorted(self.shifts.values(), key=lambda d: d["created_at"]):
+            if 0 <= doc["day_of_week"] < 7:
+                days[doc["day_of_week"]][doc["time_slot"]].append(doc)
+        
+        return {
+            "store_id": self.store_id,
+            "week_start": self.week_start,
+            "time_slots": time_slots,
+            "days": [{"day_of_week": day, "slots": slots} for day, slots in enumerate(days)],
+        }
+
+    def render(self) -> tuple:
+        if self._rendered is None:
+            body = orjson.dumps(self.grid())
+            self._rendered = (body, make_etag(hashlib.sha1(body).hexdigest()))
+        return self._rendered
+
+# Snapshots loaded from db.shifts on first use and patched by every shift
+# write. Subclasses say which key a shift belongs to and how to load one.
+class SnapshotCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loading = defaultdict(int)
+        self._dirty = set()
+
+    def key_for(self, shift_doc: dict) -> tuple:
+        raise NotImplementedError
+
+    async def _load(self, *key):
+        raise NotImplementedError
+
+    async def get(self, *key):
+        snapshot = self._cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        
+        self._loading[key] += 1
+        try:
+            snapshot = await self._load(*key)
+        finally:
+            self._loading[key] -= 1
+            dirty = key in self._dirty
+            if not self._loading[key]:
+                del self._loading[key]
+                self._dirty.discard(key)
+        
+        # A write that landed mid-load may be missing, so don't keep the result
+        if not dirty:
+            self._cache.set(key, snapshot)
+        return snapshot
+
+    def apply(self, action: str, shift_doc: dict):
+        key = self.key_for(shift_doc)
+        if key in self._loading:
+            self._dirty.add(key)
+        snapshot = self._cache.peek(key)
+        if snapshot is not None:
+            snapshot.apply(action, shift_doc)
+
+    def invalidate(self):
+        self._dirty.update(self._loading)
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+class WeekScheduleCache(SnapshotCache):
+    def key_for(self, shift_doc: dict) -> tuple:
+        return (shift_doc["store_id"], shift_doc["week_start"])
+
+    async def _load(self, store_id: str, week_start: str) -> WeekSchedule:
+        await store_cache.ensure_loaded()
+        store = store_cache.get(store_id)
+        shift_docs = await db.shifts.find(
+            {"store_id": store_id, "week_start": week_start},
+            SHIFT_PROJECTION
+        ).to_list(None)
+        return WeekSchedule(store_id, week_start, store["time_slots"] if store else [], shift_docs)
+
+    def invalidate(self, store_id: Optional[str] = None, week_start: Optional[str] = None):
+        if store_id is None:
+            super().invalidate()
+            return
+        for key in list(self._cache._data):
+            if key[0] == store_id and week_start in (None, key[1]):
+                self._cache.pop(key)
+        self._dirty.update(
+            key for key in self._loading if key[0] == store_id and week_start in (None, key[1])
+        )
+
+week_schedules = WeekScheduleCache(
+    maxsize=int(os.environ.get('WEEK_SCHEDULE_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('WEEK_SCHEDULE_TTL', '3600')),
+)
+
+# Per-user interval index: a user's active shifts in one week, across all
+# stores, as (start, end, shift_id) sorted by start. Times are minutes from
+# the week's Monday 00:00; slots crossing midnight end past their day.
+def shift_interval(shift_doc: dict) -> Optional[tuple]:
+    slot = store_cache.time_slots(shift_doc["store_id"]).get(shift_doc["time_slot"])
+    if slot is None:
+        return None
+    offset = shift_doc["day_of_week"] * 1440
+    return (offset + slot.start, offset + slot.end, shift_doc["id"])
+
+def adjacent_week(week_start: str, weeks: int) -> Optional[str]:
+    try:
+        return (datetime.fromisoformat(week_start) + timedelta(weeks=weeks)).date().isoformat()
+    except ValueError:
+        return None
+
+def week_windows(week_start: str, start: int, end: int) -> List[tuple]:
+    """(week_start, start, end) of every week an interval has to be checked in.
+
+    Monday early slots can collide with last week's Sunday night, and Sunday
+    night slots with next week's Monday, so those also get the neighbouring
+    week with the interval shifted into its minutes.
+    """
+    windows = [(week_start, start, end)]
+    if start < 1440:
+        previous_week = adjacent_week(week_start, -1)
+        if previous_week:
+            windows.append((previous_week, start + 7 * 1440, end + 7 * 1440))
+    if end > 7 * 1440:
+        next_week = adjacent_week(week_start, 1)
+        if next_week:
+            windows.append((next_week, start - 7 * 1440, end - 7 * 1440))
+    return windows
+
+class UserWeekIntervals:
+    def __init__(self, shift_docs: List[dict]):
+        self.intervals = []
+        self.shifts = {}
+        self._by_id = {}
+        for doc in shift_docs:
+            self.apply("created", doc)
+
+    def apply(self, action: str, shift_doc: dict):
+        previous = self._by_id.pop(shift_doc["id"], None)
+        if previous is not None:
+            del self.intervals[bisect.bisect_left(self.intervals, previous)]
+            del self.shifts[shift_doc["id"]]
+        
+        if action != "deleted" and shift_doc["status"] in ACTIVE_STATUSES:
+            interval = shift_interval(shift_doc)
+            if interval is not None:
+                bisect.insort(self.intervals, interval)
+                self._by_id[shift_doc["id"]] = interval
+                self.shifts[shift_doc["id"]] = shift_doc
+
+    def overlapping(self, start: int, end: int, exclude_shift_id: Optional[str] = None) -> Optional[dict]:
+        # Everything left of the bisection point starts before `end`. A slot
+        # lasts at most a day, so the walk back stops a day before `start`.
+        index = bisect.bisect_left(self.intervals, (end,))
+        while index > 0:
+            index -= 1
+            other_start, other_end, shift_id = self.intervals[index]
+            if other_start <= start - 1440:
+                break
+            if other_end > start and shift_id != exclude_shift_id:
+                return self.shifts[shift_id]
+        return None
+
+class UserIntervalCache(SnapshotCache):
+    def key_for(self, shift_doc: dict) -> tuple:
+        return (shift_doc["user_id"], shift_doc["week_start"])
+
+    async def _load(self, user_id: str, week_start: str) -> UserWeekIntervals:
+        await store_cache.ensure_loaded()
+        shift_docs = await db.shifts.find(
+            {"user_id": user_id, "week_start": week_start, "status": {"$in": ACTIVE_STATUSES}},
+            SHIFT_PROJECTION
+        ).to_list(None)
+        return UserWeekIntervals(shift_docs)
+
+    async def overlapping(self, shift_doc: dict, exclude_shift_id: Optional[str] = None) -> Optional[dict]:
+        interval = shift_interval(shift_doc)
+        if interval is None:
+            return None
+        for week_start, start, end in week_windows(shift_doc["week_start"], interval[0], interval[1]):
+            found = (await self.get(shift_doc["user_id"], week_start)).overlapping(start, end, exclude_shift_id)
+            if found is not None:
+                return found
+        return None
+
+def interval_index(shift_docs: List[dict]) -> defaultdict:
+    """UserWeekIntervals by (user_id, week_start) for bulk writes that read
+    their users' shifts in one query"""
+    intervals = defaultdict(lambda: UserWeekIntervals([]))
+    for doc in shift_docs:
+        intervals[(doc["user_id"], doc["week_start"])].apply("created", doc)
+    return intervals
+
+def overlapping_in(intervals: defaultdict, shift_doc: dict, interval: tuple) -> Optional[dict]:
+    for week_start, start, end in week_windows(shift_doc["week_start"], interval[0], interval[1]):
+        found = intervals[(shift_doc["user_id"], week_start)].overlapping(start, end, shift_doc["id"])
+        if found is not None:
+            return found
+    return None
+
+def neighbouring_weeks(week_starts) -> List[str]:
+    """The weeks plus those either side, whose shifts can overlap across Sunday night"""
+    weeks = set(week_starts) | {
+        adjacent_week(week_start, offset) for week_start in week_starts for offset in (-1, 1)
+    }
+    return list(weeks - {None})
+
+user_intervals = UserIntervalCache(
+    maxsize=int(os.environ.get('USER_INTERVAL_CACHE_SIZE', '8192')),
+    ttl=float(os.environ.get('USER_INTERVAL_TTL', '3600')),
+)
+
+def apply_to_snapshots(action: str, shift_docs: List[dict]):
+    for doc in shift_docs:
+        week_schedules.apply(action, doc)
+        user_intervals.apply(action, doc)
+
+def double_booking(shift_doc: dict, other_shift: dict) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": (
+                f"Double booking! {shift_doc['user_name']} already has an overlapping shift: "
+                f"{other_shift['time_slot']} at store {other_shift['store_id']}."
+            ),
+            "conflicting_shift": other_shift
+        }
+    )
+
+# Fan-out of cache changes to the other workers. Each worker appends events
+# to the capped cache_events collection and tails it, skipping its own.
+class CacheBroadcast:
+    def __init__(self, size_bytes: int):
+        self.size_bytes = size_bytes
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self.sent = 0
+        self.received = 0
+        self.resyncs = 0
+        self._handlers = {}
+
+    def handler(self, kind: str):
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    async def publish(self, kind: str, **payload):
+        if CACHE_BROADCAST != "capped":
+            return
+        await db.cache_events.insert_one({
+            "origin": self.origin,
+            "kind": kind,
+            "at": datetime.now(timezone.utc),
+            **payload
+        })
+        self.sent += 1
+
+    async def ensure_collection(self):
+        try:
+            await db.create_collection("cache_events", capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+
+    async def listen(self):
+        first = True
+        while True:
+            try:
+                await self.ensure_collection()
+                # Events missed while the tail was down are unknown, so
+                # start over from empty caches
+                if not first:
+                    self.resyncs += 1
+                    await self._handlers["reset"]({})
+                first = False
+                # Tail from our own hello event onwards: older events are already
+                # reflected in what we loaded, and a tailable cursor whose query
+                # matches nothing is closed by the server straight away
+                started = datetime.now(timezone.utc)
+                await db.cache_events.insert_one({"origin": self.origin, "kind": "hello", "at": started})
+                cursor = db.cache_events.find(
+                    {"at": {"$gte": started}},
+                    cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                while cursor.alive:
+                    async for event in cursor:
+                        if event["origin"] == self.origin:
+                            continue
+                        handle = self._handlers.get(event["kind"])
+                        if handle is not None:
+                            self.received += 1
+                            await handle(event)
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Cache broadcast tail failed, restarting: %s", e)
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "mode": CACHE_BROADCAST,
+            "origin": self.origin,
+            "sent": self.sent,
+            "received": self.received,
+            "resyncs": self.resyncs,
+        }
+
+cache_broadcast = CacheBroadcast(size_bytes=CACHE_BROADCAST_SIZE_BYTES)
+
+@cache_broadcast.handler("shifts")
+async def on_shifts_changed(event: dict):
+    apply_to_snapshots(event["action"], event["shifts"])
+    if SHIFT_EVENTS_SOURCE == "local":
+        for doc in event["shifts"]:
+            shift_events.publish(event["action"], doc)
+
+@cache_broadcast.handler("token_revoked")
+async def on_token_revoked(event: dict):
+    revoked_tokens[event["jti"]] = event["exp"]
+
+@cache_broadcast.handler("schedule_rebuild")
+async def on_schedule_rebuild(event: dict):
+    week_schedules.invalidate(event["store_id"], event["week_start"])
+
+@cache_broadcast.handler("reset")
+async def on_reset(event: dict):
+    global tokens_not_before
+    if "not_before" in event:
+        tokens_not_before = max(tokens_not_before, event["not_before"])
+    user_cache.clear()
+    week_schedules.invalidate()
+    user_intervals.invalidate()
+    await store_cache.load()
+
+# Unordered bulk writes where a unique index turning some operations away
+# is an expected outcome (a slot taken since it was read, a rollup already
+# rebuilt at a newer version) rather than a failure
+async def skip_duplicates(write) -> Tuple[dict, set]:
+    """Await an unordered insert_many/bulk_write and return its bulk API
+    result (empty for insert_many) and the indexes of the operations that hit
+    a duplicate key. Any other write error is raised."""
+    try:
+        result = await write
+    except BulkWriteError as e:
+        rejected = set()
+        for error in e.details["writeErrors"]:
+            if error["code"] != 11000:
+                raise
+            rejected.add(error["index"])
+        return e.details, rejected
+    return getattr(result, "bulk_api_result", {}), set()
+
+async def insert_shifts(docs: List[dict]) -> set:
+    """Insert shift documents unordered; returns the indexes of taken slots"""
+    # insert_many adds _id to what it is given, so hand it copies
+    _, rejected = await skip_duplicates(db.shifts.insert_many([dict(doc) for doc in docs], ordered=False))
+    return rejected
+
+# Reporting rollups: one document per (store, week) in db.shift_rollups
+# with minutes per user, active shifts per cell and counts per status, all
+# kept as counters. Every shift write $inc's the difference between the
+# documents before and after it, so a write never re-reads its week. The
+# aggregation in /reports/rebuild sets whole rollups and stamps them with
+# the week version it read; deltas up to that version are already in it.
+def cell_key(day_of_week: int, time_slot: str) -> str:
+    return f"{day_of_week} {time_slot}"
+
+def rollup_counters(shift_doc: dict, sign: int, counters: defaultdict, user_names: dict):
+    """Add what one shift contributes to its rollup, times sign, to counters by dotted path"""
+    status = shift_doc["status"]
+    counters[f"status_counts.{status}"] += sign
+    if status not in ACTIVE_STATUSES:
+        return
+    slot = store_cache.time_slots(shift_doc["store_id"]).get(shift_doc["time_slot"])
+    minutes = slot.end - slot.start if slot else 0
+    user = f"users.{shift_doc['user_id']}"
+    cell = f"cells.{cell_key(shift_doc['day_of_week'], shift_doc['time_slot'])}"
+    # Both statuses are touched so every entry carries both fields
+    for active_status in ACTIVE_STATUSES:
+        counters[f"{user}.{active_status}_minutes"] += sign * minutes if status == active_status else 0
+        counters[f"{cell}.{active_status}"] += sign if status == active_status else 0
+    counters[f"{user}.shifts"] += sign
+    if sign > 0:
+        user_names[shift_doc["user_id"]] = shift_doc["user_name"]
+
+def build_rollup(store_id: str, week_start: str, shift_docs) -> dict:
+    counters = defaultdict(int)
+    user_names = {}
+    for doc in shift_docs:
+        rollup_counters({**doc, "store_id": store_id}, 1, counters, user_names)
+    
+    rollup = {
+        "store_id": store_id,
+        "week_start": week_start,
+        "total_slots": 7 * len(store_cache.time_slots(store_id)),
+        "users": {},
+        "cells": {},
+        "status_counts": {"pending": 0, "approved": 0, "rejected": 0},
+    }
+    for path, value in counters.items():
+        *parents, field = path.split(".")
+        target = rollup
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[field] = value
+    for user_id, user_name in user_names.items():
+        rollup["users"][user_id]["user_name"] = user_name
+    return rollup
+
+def rollup_id(store_id: str, week_start: str) -> str:
+    return f"{store_id}:{week_start}"
+
+async def write_rollups(rollups: List[tuple]):
+    """Replace the counters of (rollup, version) pairs unless a newer rebuild is stored"""
+    if not rollups:
+        return
+    computed_at = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            # Rollups only ever updated by deltas carry no version
+            {"_id": rollup_id(rollup["store_id"], rollup["week_start"]), "version": {"$not": {"$gt": version}}},
+            {"$set": {**rollup, "version": version, "computed_at": computed_at}},
+            upsert=True
+        )
+        for rollup, version in rollups
+    ]
+    # The upsert collides with a rollup whose version is already newer
+    await skip_duplicates(db.shift_rollups.bulk_write(operations, ordered=False))
+
+async def update_rollups(action: str, shift_docs: List[dict], previous_docs: List[dict], versions: dict):
+    """$inc the rollups by the difference between previous_docs and shift_docs"""
+    await store_cache.ensure_loaded()
+    counters = defaultdict(lambda: defaultdict(int))
+    user_names = defaultdict(dict)
+    if action != "created":
+        for doc in previous_docs if action == "updated" else shift_docs:
+            week = (doc["store_id"], doc["week_start"])
+            rollup_counters(doc, -1, counters[week], user_names[week])
+    if action != "deleted":
+        for doc in shift_docs:
+            week = (doc["store_id"], doc["week_start"])
+            rollup_counters(doc, 1, counters[week], user_names[week])
+    
+    computed_at = datetime.now(timezone.utc)
+    operations = []
+    for (store_id, week_start), week_counters in counters.items():
+        # Edits that don't touch a counted field leave the rollup alone
+        if not any(week_counters.values()):
+            continue
+        operations.append(UpdateOne(
+            # A rebuild stamped with this version or later already counts the write
+            {
+                "_id": rollup_id(store_id, week_start),
+                "version": {"$not": {"$gte": versions[week_version_key(store_id, week_start)]}}
+            },
+            {
+                "$inc": dict(week_counters),
+                "$set": {
+                    "store_id": store_id,
+                    "week_start": week_start,
+                    "total_slots": 7 * len(store_cache.time_slots(store_id)),
+                    "computed_at": computed_at,
+                    **{
+                        f"users.{user_id}.user_name": user_name
+                        for user_id, user_name in user_names[(store_id, week_start)].items()
+                    },
+                },
+            },
+            # Taking something away assumes the rollup already counted it; a
+            # missing one is left for the startup backfill or a rebuild
+            upsert=all(value >= 0 for value in week_counters.values())
+        ))
+    if operations:
+        await skip_duplicates(db.shift_rollups.bulk_write(operations, ordered=False))
+
+# Called after every shift write with the affected documents. Updates also
+# pass the documents as they were before the write, in any order.
+async def shifts_changed(action: str, shift_docs: List[dict], previous_docs: Optional[List[dict]] = None):
+    if action == "updated" and previous_docs is None:
+        raise ValueError("Updated shifts need their previous documents")
+    previous_docs = previous_docs or []
+    weeks = {(doc["store_id"], doc["week_start"]) for doc in [*shift_docs, *previous_docs]}
+    versions = await bump_versions(week_version_key(*week) for week in weeks)
+    await update_rollups(action, shift_docs, previous_docs, versions)
+    apply_to_snapshots(action, shift_docs)
+    if SHIFT_EVENTS_SOURCE == "local":
+        for doc in shift_docs:
+            shift_events.publish(action, doc)
+    # insert_one adds _id to the dict it is given, so send copies
+    await cache_broadcast.publish("shifts", action=action, shifts=[dict(doc) for doc in shift_docs])
+
+# Grid-shaped week: days[day_of_week].slots[time_slot] -> shifts, served
+# from the materialized snapshot
+@api_router.get("/schedule")
+async def get_schedule(
+    store_id: str,
+    week_start: str,
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    schedule = await week_schedules.get(store_id, week_start)
+    body, etag = schedule.render()
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    return Response(body, media_type="application/json", headers=etag_headers(etag))
+
+@api_router.post("/schedule/rebuild")
+async def rebuild_schedule(
+    store_id: Optional[str] = None,
+    week_start: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can rebuild schedules")
+    
+    week_schedules.invalidate(store_id, week_start)
+    await cache_broadcast.publish("schedule_rebuild", store_id=store_id, week_start=week_start)
+    if store_id and week_start:
+        schedule = await week_schedules.get(store_id, week_start)
+        return {"rebuilt": 1, "shifts": len(schedule.shifts)}
+    
+    return {"rebuilt": 0, "message": "Snapshots dropped, they reload from db.shifts on next read"}
+
+# Auto roster. Each week is solved on its own: the open cells of all
+# requested stores are filled greedily, scarcest cell first, with the
+# eligible user whose hours (plus a same-day penalty) are lowest among those
+# who are free, under the hour cap and member of the cell's store.
+def shift_type_for(slot: TimeSlot) -> str:
+    if slot.start < 12 * 60:
+        return "morning"
+    if slot.start < 18 * 60:
+        return "evening"
+    return "night"
+
+def plan_roster(
+    eligible: np.ndarray,
+    cell_day: np.ndarray,
+    cell_start: np.ndarray,
+    cell_end: np.ndarray,
+    busy: List[tuple],
+    max_minutes: float,
+    nearby: List[tuple] = ()
+) -> np.ndarray:
+    """Assign users to cells of one week.
+
+    eligible is a users x cells bool matrix, cell times are minutes from the
+    week start (ends past midnight run into the next day) and busy holds
+    (user, start, end) of shifts the users already have. nearby holds the
+    same for shifts of the weeks either side, shifted into this week's
+    minutes; they block overlapping cells but don't count toward the hours.
+    Returns the user index per cell, -1 where nobody could take it.
+    """
+    users, cells = eligible.shape
+    duration = (cell_end - cell_start).astype(float)
+    # overlaps[a, b]: cells a and b can't be worked by the same person
+    overlaps = (cell_start[:, None] < cell_end[None, :]) & (cell_end[:, None] > cell_start[None, :])
+    blocked = np.zeros((users, cells), dtype=bool)
+    minutes = np.zeros(users)
+    day_load = np.zeros((users, 8))
+    
+    for user, start, end in busy:
+        blocked[user] |= (cell_start < end) & (cell_end > start)
+        minutes[user] += end - start
+        day_load[user, start // 1440] += 1
+    for user, start, end in nearby:
+        blocked[user] |= (cell_start < end) & (cell_end > start)
+    
+    assignment = np.full(cells, -1)
+    for cell in np.argsort(eligible.sum(axis=0), kind="stable"):
+        feasible = eligible[:, cell] & ~blocked[:, cell] & (minutes + duration[cell] <= max_minutes)
+        if not feasible.any():
+            continue
+        cost = np.where(feasible, minutes + ROSTER_SAME_DAY_PENALTY * day_load[:, cell_day[cell]], np.inf)
+        user = int(np.argmin(cost))
+        assignment[cell] = user
+        blocked[user] |= overlaps[cell]
+        minutes[user] += duration[cell]
+        day_load[user, cell_day[cell]] += 1
+    
+    return assignment
+
+@api_router.post("/schedule/auto-fill")
+async def auto_fill_schedule(
+    roster: RosterRequest,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can generate rosters")
+    
+    store_ids = list(dict.fromkeys(roster.store_ids))
+    week_starts = iso_weeks(list(dict.fromkeys(roster.week_starts)))
+    if any(store_id not in user.store_ids for store_id in store_ids):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    await store_cache.ensure_loaded()
+    missing = [store_id for store_id in store_ids if store_cache.get(store_id) is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Store not found: {', '.join(missing)}")
+    
+    staff = await db.users.find(
+        {"role": "user", "store_ids": {"$in": store_ids}},
+        {"_id": 0, "id": 1, "name": 1, "store_ids": 1}
+    ).to_list(None)
+    staff_index = {member["id"]: index for index, member in enumerate(staff)}
+    
+    # Active shifts occupying the requested stores, plus everything the staff
+    # already works elsewhere, in one query. The staff's shifts in the weeks
+    # either side count for overlaps across Sunday night.
+    existing = await db.shifts.find(
+        {
+            "status": {"$in": ACTIVE_STATUSES},
+            "$or": [
+                {"store_id": {"$in": store_ids}, "week_start": {"$in": week_starts}},
+                {"user_id": {"$in": list(staff_index)}, "week_start": {"$in": neighbouring_weeks(week_starts)}},
+            ]
+        },
+        {"_id": 0, "store_id": 1, "user_id": 1, "week_start": 1, "day_of_week": 1, "time_slot": 1}
+    ).to_list(None)
+    
+    taken = {slot_key(doc) for doc in existing}
+    busy_by_week = defaultdict(list)
+    nearby_by_week = defaultdict(list)
+    for doc in existing:
+        slot = store_cache.time_slots(doc["store_id"]).get(doc["time_slot"])
+        if doc["user_id"] not in staff_index or slot is None:
+            continue
+        offset = doc["day_of_week"] * 1440
+        member = staff_index[doc["user_id"]]
+        windows = week_windows(doc["week_start"], offset + slot.start, offset + slot.end)
+        busy_by_week[doc["week_start"]].append((member, *windows[0][1:]))
+        for week_start, start, end in windows[1:]:
+            nearby_by_week[week_start].append((member, start, end))
+    
+    store_slots = [
+        (store_id, slot)
+        for store_id in store_ids
+        for slot in store_cache.time_slots(store_id).values()
+    ]
+    store_position = {store_id: index for index, store_id in enumerate(store_ids)}
+    membership = np.array(
+        [[store_id in member["store_ids"] for store_id in store_ids] for member in staff],
+        dtype=bool
+    ).reshape(len(staff), len(store_ids))
+    
+    created_at = datetime.now(timezone.utc).isoformat()
+    docs = []
+    unfilled = []
+    for week_start in week_starts:
+        cells = [
+            (store_id, day, slot)
+            for day in range(7)
+            for store_id, slot in store_slots
+            if (store_id, week_start, day, slot.label) not in taken
+        ]
+        if not cells:
+            continue
+        
+        cell_day = np.array([day for _, day, _ in cells])
+        assignment = plan_roster(
+            membership[:, [store_position[store_id] for store_id, _, _ in cells]],
+            cell_day,
+            cell_day * 1440 + np.array([slot.start for _, _, slot in cells]),
+            cell_day * 1440 + np.array([slot.end for _, _, slot in cells]),
+            busy_by_week[week_start],
+            roster.max_hours_per_user * 60,
+            nearby_by_week[week_start]
+        )
+        
+        for (store_id, day, slot), member in zip(cells, assignment):
+            if member < 0:
+                unfilled.append({
+                    "store_id": store_id,
+                    "week_start": week_start,
+                    "day_of_week": day,
+                    "time_slot": slot.label
+                })
+                continue
+            docs.append(Shift(
+                id=str(uuid.uuid4()),
+                store_id=store_id,
+                user_id=staff[member]["id"],
+                user_name=staff[member]["name"],
+                day_of_week=day,
+                time_slot=slot.label,
+                shift_type=shift_type_for(slot),
+                notes="Auto-scheduled",
+                status="approved",
+                week_start=week_start,
+                created_at=created_at
+            ).model_dump())
+    
+    conflicts = 0
+    if docs and not roster.dry_run:
+        # A concurrent write may have taken a slot since we read the week
+        rejected = await insert_shifts(docs)
+        conflicts = len(rejected)
+        docs = [doc for index, doc in enumerate(docs) if index not in rejected]
+        await shifts_changed("created", docs)
+    
+    hours = defaultdict(float)
+    for doc in docs:
+        slot = store_cache.time_slots(doc["store_id"])[doc["time_slot"]]
+        hours[doc["user_id"]] += (slot.end - slot.start) / 60
+    
+    return {
+        "dry_run": roster.dry_run,
+        "created": 0 if roster.dry_run else len(docs),
+        "conflicts": conflicts,
+        "unfilled": unfilled,
+        "assigned_hours": hours,
+        "shifts": docs
+    }
+
+# Week copies and recurring templates. Both expand a pattern of
+# (user, day, time_slot) into target weeks with one read of what is already
+# there and one insert_many; taken slots and double bookings are skipped
+# and reported rather than failing the request.
+def iso_weeks(week_starts: List[str]) -> List[str]:
+    # Week keys are compared as strings, so only plain YYYY-MM-DD is accepted
+    for week_start in week_starts:
+        if adjacent_week(week_start, 0) != week_start:
+            raise HTTPException(status_code=422, detail=f"week_start '{week_start}' is not an ISO date")
+    return week_starts
+
+def following_weeks(week_start: str, first: int, count: int) -> List[str]:
+    iso_weeks([week_start])
+    return [adjacent_week(week_start, offset) for offset in range(first, first + count)]
+
+async def clone_shifts(store_id: str, pattern: List[dict], week_starts: List[str]) -> dict:
+    week_starts = list(dict.fromkeys(week_starts))
+    existing = await db.shifts.find(
+        {
+            "status": {"$in": ACTIVE_STATUSES},
+            "$or": [
+                {"store_id": store_id, "week_start": {"$in": week_starts}},
+                {
+                    "user_id": {"$in": list({shift["user_id"] for shift in pattern})},
+                    "week_start": {"$in": neighbouring_weeks(week_starts)},
+                },
+            ]
+        },
+        {"_id": 0, "id": 1, "store_id": 1, "user_id": 1, "week_start": 1,
+         "day_of_week": 1, "time_slot": 1, "status": 1}
+    ).to_list(None)
+    
+    taken = {slot_key(doc) for doc in existing}
+    intervals = interval_index(existing)
+    
+    created_at = datetime.now(timezone.utc).isoformat()
+    docs = []
+    skipped = []
+    for week_start in week_starts:
+        for shift in pattern:
+            doc = {
+                "id": str(uuid.uuid4()),
+                "store_id": store_id,
+                "user_id": shift["user_id"],
+                "user_name": shift["user_name"],
+                "day_of_week": shift["day_of_week"],
+                "time_slot": shift["time_slot"],
+                "shift_type": shift["shift_type"],
+                "notes": shift.get("notes") or "",
+                "status": shift.get("status", "approved"),
+                "week_start": week_start,
+                "created_at": created_at,
+            }
+            interval = shift_interval(doc)
+            if interval is None or not store_cache.offers(store_id, doc["time_slot"]):
+                reason = "invalid_slot"
+            elif slot_key(doc) in taken:
+                reason = "slot_taken"
+            elif overlapping_in(intervals, doc, interval):
+                reason = "double_booked"
+            else:
+                taken.add(slot_key(doc))
+                intervals[(doc["user_id"], week_start)].apply("created", doc)
+                docs.append(doc)
+                continue
+            skipped.append({
+                "week_start": week_start,
+                "day_of_week": doc["day_of_week"],
+                "time_slot": doc["time_slot"],
+                "user_id": doc["user_id"],
+                "reason": reason,
+            })
+    
+    if docs:
+        # Taken by a concurrent write since we read the weeks
+        rejected = await insert_shifts(docs)
+        for index in sorted(rejected):
+            doc = docs[index]
+            skipped.append({
+                "week_start": doc["week_start"],
+                "day_of_week": doc["day_of_week"],
+                "time_slot": doc["time_slot"],
+                "user_id": doc["user_id"],
+                "reason": "slot_taken",
+            })
+        docs = [doc for index, doc in enumerate(docs) if index not in rejected]
+        if docs:
+            await shifts_changed("created", docs)
+    
+    return {"week_starts": week_starts, "created": len(docs), "skipped": skipped}
+
+@api_router.post("/schedule/copy")
+async def copy_week(
+    copy: WeekCopy,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can copy weeks")
+    
+    if copy.store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    week_starts = iso_weeks(copy.week_starts) if copy.week_starts else following_weeks(copy.week_start, 1, copy.weeks)
+    await store_cache.ensure_loaded()
+    # Active shifts keep their status; pending requests stay pending
+    pattern = await db.shifts.find(
+        {"store_id": copy.store_id, "week_start": copy.week_start, "status": {"$in": ACTIVE_STATUSES}},
+        SHIFT_PROJECTION
+    ).to_list(None)
+    
+    return await clone_shifts(copy.store_id, pattern, [week for week in week_starts if week != copy.week_start])
+
+@api_router.get("/templates")
+async def get_templates(
+    store_id: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if store_id and store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    query = {"store_id": store_id} if store_id else {"store_id": {"$in": user.store_ids}}
+    return await db.shift_templates.find(query, {"_id": 0}).to_list(None)
+
+@api_router.post("/templates")
+async def create_template(
+    template_data: ShiftTemplateCreate,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can create templates")
+    
+    if template_data.store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    await store_cache.ensure_loaded()
+    if template_data.from_week:
+        shifts = await db.shifts.find(
+            {
+                "store_id": template_data.store_id,
+                "week_start": template_data.from_week,
+                "status": {"$in": ACTIVE_STATUSES}
+            },
+            # status too, so pending requests stay pending wherever it is applied
+            {"_id": 0, "user_id": 1, "day_of_week": 1, "time_slot": 1, "shift_type": 1, "notes": 1, "status": 1}
+        ).to_list(None)
+    elif template_data.shifts:
+        shifts = [shift.model_dump() for shift in template_data.shifts]
+    else:
+        raise HTTPException(status_code=422, detail="Give either from_week or shifts")
+    
+    for shift in shifts:
+        check_slot(template_data.store_id, shift["time_slot"])
+    
+    staff = {
+        doc["id"]: doc
+        async for doc in db.users.find(
+            {"id": {"$in": list({shift["user_id"] for shift in shifts})}},
+            {"_id": 0, "id": 1, "name": 1, "store_ids": 1}
+        )
+    }
+    for shift in shifts:
+        member = staff.get(shift["user_id"])
+        if member is None or template_data.store_id not in member["store_ids"]:
+            raise HTTPException(
+                status_code=422,
+                detail=f"User {shift['user_id']} does not work at store {template_data.store_id}"
+            )
+        shift["user_name"] = member["name"]
+    
+    template = {
+        "id": str(uuid.uuid4()),
+        "name": template_data.name,
+        "store_id": template_data.store_id,
+        "shifts": shifts,
+        "created_by": user.id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await db.shift_templates.insert_one(dict(template))
+    return template
+
+@api_router.delete("/templates/{template_id}")
+async def delete_template(
+    template_id: str,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can delete templates")
+    
+    result = await db.shift_templates.delete_one({"id": template_id, "store_id": {"$in": user.store_ids}})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    return {"message": "Template deleted successfully"}
+
+# Stamps a template onto explicit weeks or onto `weeks` weeks from start_week,
+# e.g. {"start_week": "2026-01-05", "weeks": 13} for a quarter
+@api_router.post("/templates/{template_id}/apply")
+async def apply_template(
+    template_id: str,
+    target: TemplateApply,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can apply templates")
+    
+    template = await db.shift_templates.find_one(
+        {"id": template_id, "store_id": {"$in": user.store_ids}},
+        {"_id": 0}
+    )
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    if target.week_starts:
+        week_starts = iso_weeks(target.week_starts)
+    elif target.start_week:
+        week_starts = following_weeks(target.start_week, 0, target.weeks)
+    else:
+        raise HTTPException(status_code=422, detail="Give either week_starts or start_week")
+    
+    await store_cache.ensure_loaded()
+    return await clone_shifts(template["store_id"], template["shifts"], week_starts)
+
+# Server-sent events for one store week. EventSource can't send headers,
+# and a bearer token in the query string would end up in access logs, so
+# clients first trade it for a short-lived token valid for this week only.
+@api_router.post("/shifts/events/token")
+async def shift_event_token(
+    store_id: str,
+    week_start: str,
+    authorization: Optional[str] = Header(None)
+):
+    user, jti, _ = await current_session(authorization)
+    
+    if store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {
+        "token": issue_stream_token(user, jti, store_id, week_start),
+        "expires_in": STREAM_TOKEN_TTL_SECONDS
+    }
+
+@api_router.get("/shifts/events")
+async def shift_event_stream(
+    store_id: str,
+    week_start: str,
+    token: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    if authorization:
+        user, jti, issued_at = await current_session(authorization)
+        if store_id not in user.store_ids:
+            raise HTTPException(status_code=403, detail="Access denied")
+    else:
+        claims = decode_stream_token(token or "", store_id, week_start)
+        jti, issued_at = claims["session"], claims["iat"]
+    
+    queue = shift_events.subscribe(store_id, week_start)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SHIFT_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    event = None
+                # The session is re-checked on every wake-up, so a logout ends
+                # the stream within one keepalive interval
+                if session_revoked(jti, issued_at):
+                    break
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['action']}\ndata: {orjson.dumps(event).decode()}\n\n"
+        finally:
+            shift_events.unsubscribe(store_id, week_start, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/shifts", response_model=List[Shift])
+async def get_shifts(
+    store_id: str,
+    week_start: str,
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    # Read the version before the shifts so the ETag is never newer than the data
+    etag = make_etag(await get_version(week_version_key(store_id, week_start)), store_id, week_start)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    shifts = await db.shifts.find(
+        {"store_id": store_id, "week_start": week_start},
+        SHIFT_PROJECTION
+    ).to_list(1000)
+    
+    return trusted_response(shifts, etag_headers(etag))
+
+def encode_cursor(shift_doc: dict) -> str:
+    position = [shift_doc["store_id"], shift_doc["week_start"], shift_doc["id"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if not isinstance(position, list) or len(position) != 3:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return position
+
+# Streams NDJSON ordered by (store_id, week_start, id). When limit is set and
+# more rows remain, the last line is {"next_cursor": ...} to pass as `after`.
+@api_router.get("/shifts/range")
+async def get_shifts_range(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    query = store_week_query(user, store_ids, week_from, week_to)
+    
+    if after:
+        store_id, week_start, shift_id = decode_cursor(after)
+        query["$or"] = [
+            {"store_id": {"$gt": store_id}},
+            {"store_id": store_id, "week_start": {"$gt": week_start}},
+            {"store_id": store_id, "week_start": week_start, "id": {"$gt": shift_id}},
+        ]
+    
+    cursor = db.shifts.find(query, SHIFT_PROJECTION).sort(
+        [("store_id", ASCENDING), ("week_start", ASCENDING), ("id", ASCENDING)]
+    ).batch_size(STREAM_BATCH_SIZE)
+    if limit:
+        # One extra row tells us whether another page exists
+        cursor = cursor.limit(limit + 1)
+    
+    async def stream():
+        sent = 0
+        last_doc = None
+        async for doc in cursor:
+            if limit and sent == limit:
+                yield orjson.dumps({"next_cursor": encode_cursor(last_doc)}) + b"\n"
+                break
+            yield orjson.dumps(doc) + b"\n"
+            last_doc = doc
+            sent += 1
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Bulk export and import. Both stream: export writes one cursor batch at a
+# time, import parses the upload as it arrives and writes every
+# STREAM_BATCH_SIZE rows, so memory stays flat whatever the size.
+EXPORT_FIELDS = [
+    "id", "store_id", "user_id", "user_name", "week_start", "day_of_week",
+    "time_slot", "shift_type", "notes", "status", "created_at",
+]
+
+@api_router.get("/shifts/export")
+async def export_shifts(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    query = store_week_query(user, store_ids, week_from, week_to)
+    
+    cursor = db.shifts.find(query, SHIFT_PROJECTION).sort(
+        [("store_id", ASCENDING), ("week_start", ASCENDING), ("id", ASCENDING)]
+    ).batch_size(STREAM_BATCH_SIZE)
+    
+    async def stream_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        rows = 0
+        async for doc in cursor:
+            writer.writerow(doc)
+            rows += 1
+            if rows % STREAM_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    async def stream_ndjson():
+        async for doc in cursor:
+            yield orjson.dumps(doc) + b"\n"
+    
+    if format == "csv":
+        body, media_type = stream_csv(), "text/csv"
+    else:
+        body, media_type = stream_ndjson(), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="shifts.{format}"'}
+    )
+
+async def upload_lines(request: Request):
+    """Lines of the uploaded file as they arrive. Takes a raw body or the
+    file part of a multipart/form-data upload."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    pending = bytearray()
+    
+    if content_type == b"multipart/form-data":
+        part = {"field": b"", "value": b"", "headers": {}, "active": False, "done": False}
+        
+        def on_header_field(data, start, end):
+            part["field"] += data[start:end]
+        
+        def on_header_value(data, start, end):
+            part["value"] += data[start:end]
+        
+        def on_header_end():
+            part["headers"][part["field"].lower()] = part["value"]
+            part["field"] = part["value"] = b""
+        
+        def on_headers_finished():
+            _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+            # Only the first file part is read, other form fields are skipped
+            part["active"] = not part["done"] and (b"filename" in options or options.get(b"name") == b"file")
+            part["headers"] = {}
+        
+        def on_part_data(data, start, end):
+            if part["active"]:
+                pending.extend(data[start:end])
+        
+        def on_part_end():
+            if part["active"]:
+                part["active"] = False
+                part["done"] = True
+        
+        if b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Multipart upload without a boundary")
+        parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        })
+        feed = parser.write
+    else:
+        feed = pending.extend
+    
+    first = True
+    async for chunk in request.stream():
+        feed(chunk)
+        end = pending.rfind(b"\n")
+        if end < 0:
+            if len(pending) > IMPORT_MAX_LINE_BYTES:
+                raise HTTPException(status_code=413, detail="Import line too long")
+            continue
+        text = pending[:end].decode("utf-8")
+        del pending[:end + 1]
+        if first:
+            text = text.lstrip("\ufeff")
+            first = False
+        for line in text.split("\n"):
+            yield line.rstrip("\r")
+    
+    if pending:
+        yield pending.decode("utf-8").lstrip("\ufeff" if first else "").rstrip("\r")
+
+def quote_open(line: str, in_quotes: bool) -> bool:
+    """Whether a quoted field is still open at the end of line, given whether
+    one was open before it. Follows csv.reader: a quote only opens a field it
+    starts, and "" inside quotes is an escaped quote."""
+    position = 0
+    while True:
+        if in_quotes:
+            end = line.find('"', position)
+            if end < 0:
+                return True
+            if line.startswith('"', end + 1):
+                position = end + 2
+                continue
+            in_quotes = False
+            position = end + 1
+        elif line.startswith('"', position):
+            in_quotes = True
+            position += 1
+            continue
+        # Anything up to the next delimiter is unquoted, quotes included
+        position = line.find(",", position)
+        if position < 0:
+            return False
+        position += 1
+
+async def csv_rows(lines):
+    """Dicts keyed by the header row. One csv.reader parses every record,
+    handed its lines once no quoted field is left open, so notes may contain
+    newlines. A quoted field may span at most IMPORT_MAX_LINE_BYTES."""
+    pending = deque()
+    reader = csv.reader(iter(pending.popleft, None))
+    header = None
+    in_quotes = False
+    spanned = 0
+    async for line in lines:
+        pending.append(line + "\n")
+        in_quotes = quote_open(line, in_quotes)
+        if in_quotes:
+            spanned += len(line.encode("utf-8")) + 1
+            if spanned > IMPORT_MAX_LINE_BYTES:
+                # Give up on the record and read on from the next line
+                pending.clear()
+                in_quotes = False
+                spanned = 0
+                yield {"_error": "Quoted field runs past the import line limit"}
+            continue
+        spanned = 0
+        values = next(reader)
+        if not values or (len(values) == 1 and not values[0].strip()):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield dict(zip(header, values))
+    
+    if pending:
+        yield {"_error": "Quoted field is never closed"}
+
+async def ndjson_rows(lines):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            row = None
+        yield row if isinstance(row, dict) else {"_error": "Line is not a JSON object"}
+
+def shift_moved(old: dict, new: dict) -> bool:
+    """True when an update changes the keys snapshots and rollups are filed under"""
+    return any(old.get(field) != new.get(field) for field in ("store_id", "week_start", "user_id"))
+
+class ShiftImport:
+    """Validates rows and writes them in bulk_write chunks"""
+
+    def __init__(self, user: User, on_conflict: str):
+        self.user = user
+        self.on_conflict = on_conflict
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.staff = {}
+        self.counts = {"rows": 0, "created": 0, "updated": 0, "invalid": 0, "conflicts": 0, "replaced": 0}
+        self.errors = []
+
+    def reject(self, row_number: int, status: str, detail: str):
+        self.counts[status] += 1
+        if len(self.errors) < 100:
+            self.errors.append({"row": row_number, "status": status, "detail": detail})
+
+    def parse(self, row: dict) -> dict:
+        """Shift document for a row; raises ValueError with the reason"""
+        if "_error" in row:
+            raise ValueError(row["_error"])
+        for field in ("store_id", "user_id", "week_start", "day_of_week", "time_slot"):
+            if row.get(field) in (None, ""):
+                raise ValueError(f"Missing {field}")
+        
+        store_id = str(row["store_id"])
+        if store_id not in self.user.store_ids:
+            raise ValueError(f"No access to store {store_id}")
+        if store_cache.get(store_id) is None:
+            raise ValueError(f"Unknown store {store_id}")
+        
+        try:
+            day_of_week = int(row["day_of_week"])
+        except (TypeError, ValueError):
+            raise ValueError("day_of_week is not a number")
+        if not 0 <= day_of_week <= 6:
+            raise ValueError("day_of_week out of range")
+        
+        time_slot = str(row["time_slot"])
+        if not store_cache.offers(store_id, time_slot):
+            raise ValueError(f"Time slot '{time_slot}' is not offered by store {store_id}")
+        
+        status = row.get("status") or "approved"
+        if status not in ("pending", "approved", "rejected"):
+            raise ValueError(f"Unknown status {status}")
+        
+        week_start = str(row["week_start"])
+        try:
+            iso_weeks([week_start])
+        except HTTPException as e:
+            raise ValueError(e.detail)
+        
+        return {
+            "id": str(row.get("id") or uuid.uuid4()),
+            "store_id": store_id,
+            "user_id": str(row["user_id"]),
+            "user_name": row.get("user_name") or "",
+            "day_of_week": day_of_week,
+            "time_slot": time_slot,
+            "shift_type": row.get("shift_type") or "morning",
+            "notes": row.get("notes") or "",
+            "status": status,
+            "week_start": week_start,
+            "created_at": row.get("created_at") or self.created_at,
+        }
+
+    async def write(self, chunk: List[tuple]):
+        """Resolve users and upsert one chunk of (row_number, doc) by shift id"""
+        unknown = {doc["user_id"] for _, doc in chunk} - self.staff.keys()
+        if unknown:
+            async for doc in db.users.find(
+                {"id": {"$in": list(unknown)}},
+                {"_id": 0, "id": 1, "name": 1, "store_ids": 1}
+            ):
+                self.staff[doc["id"]] = doc
+        
+        valid = []
+        for row_number, doc in chunk:
+            member = self.staff.get(doc["user_id"])
+            if member is None:
+                self.reject(row_number, "invalid", f"Unknown user {doc['user_id']}")
+                continue
+            if doc["store_id"] not in member["store_ids"]:
+                self.reject(row_number, "invalid", f"User {doc['user_id']} does not work at store {doc['store_id']}")
+                continue
+            doc["user_name"] = member["name"]
+            valid.append((row_number, doc))
+        
+        # The same users' shifts around the chunk's weeks, so a row can't
+        # double-book someone at another store or with an earlier row
+        intervals = interval_index(await db.shifts.find(
+            {
+                "user_id": {"$in": list({doc["user_id"] for _, doc in valid})},
+                "week_start": {"$in": neighbouring_weeks({doc["week_start"] for _, doc in valid})},
+                "status": {"$in": ACTIVE_STATUSES},
+            },
+            {"_id": 0, "id": 1, "store_id": 1, "user_id": 1, "week_start": 1,
+             "day_of_week": 1, "time_slot": 1, "status": 1}
+        ).to_list(None)) if valid else {}
+        checked = []
+        for row_number, doc in valid:
+            interval = shift_interval(doc)
+            other = overlapping_in(intervals, doc, interval) if doc["status"] in ACTIVE_STATUSES else None
+            if other is not None:
+                self.reject(
+                    row_number,
+                    "conflicts",
+                    f"User {doc['user_id']} already works {other['time_slot']} at store {other['store_id']}"
+                )
+                continue
+            intervals[(doc["user_id"], doc["week_start"])].apply("updated", doc)
+            checked.append((row_number, doc))
+        valid = checked
+        
+        conflicted = await self.upsert(valid)
+        if conflicted and self.on_conflict == "replace":
+            # The file wins: whatever holds those slots now is rejected, then retried
+            occupants = await db.shifts.find(
+                {
+                    "status": {"$in": ACTIVE_STATUSES},
+                    "$or": [
+                        {"store_id": store_id, "week_start": week_start, "day_of_week": day, "time_slot": slot}
+                        for store_id, week_start, day, slot in {slot_key(doc) for _, doc in conflicted}
+                    ]
+                },
+                SHIFT_PROJECTION
+            ).to_list(None)
+            if occupants:
+                await db.shifts.update_many(
+                    {"id": {"$in": [doc["id"] for doc in occupants]}},
+                    {"$set": {"status": "rejected"}}
+                )
+                self.counts["replaced"] += len(occupants)
+                await shifts_changed("updated", [{**doc, "status": "rejected"} for doc in occupants], occupants)
+            conflicted = await self.upsert(conflicted)
+        
+        for row_number, doc in conflicted:
+            self.reject(row_number, "conflicts", "Slot is already taken")
+
+    async def upsert(self, rows: List[tuple]) -> List[tuple]:
+        """Upsert rows by id and return the ones that hit a taken slot"""
+        if not rows:
+            return []
+        
+        # An id may only overwrite a shift in one of the importer's stores
+        existing = {
+            doc["id"]: doc
+            async for doc in db.shifts.find({"id": {"$in": [doc["id"] for _, doc in rows]}}, SHIFT_PROJECTION)
+        }
+        allowed = []
+        for row_number, doc in rows:
+            old = existing.get(doc["id"])
+            if old is not None and old["store_id"] not in self.user.store_ids:
+                self.reject(row_number, "invalid", f"No access to shift {doc['id']}")
+                continue
+            allowed.append((row_number, doc))
+        rows = allowed
+        if not rows:
+            return []
+        
+        operations = [
+            UpdateOne({"id": doc["id"], "store_id": {"$in": self.user.store_ids}}, {"$set": doc}, upsert=True)
+            for _, doc in rows
+        ]
+        result, failed = await skip_duplicates(db.shifts.bulk_write(operations, ordered=False))
+        upserted = {entry["index"] for entry in result["upserted"]}
+        
+        # Updates of a shift inserted since the read above have nothing to
+        # diff against, so they count as created
+        created = [
+            doc for index, (_, doc) in enumerate(rows)
+            if index in upserted or (index not in failed and doc["id"] not in existing)
+        ]
+        updated = [
+            doc for index, (_, doc) in enumerate(rows)
+            if index not in upserted and index not in failed and doc["id"] in existing
+        ]
+        self.counts["created"] += len(created)
+        self.counts["updated"] += len(updated)
+        
+        # A row that moves a shift to another week, store or user leaves the
+        # old copy behind in those snapshots and rollups unless it is removed
+        moved = [doc for doc in updated if shift_moved(existing[doc["id"]], doc)]
+        if moved:
+            await shifts_changed("deleted", [existing[doc["id"]] for doc in moved])
+            created += moved
+            updated = [doc for doc in updated if not shift_moved(existing[doc["id"]], doc)]
+        if created:
+            await shifts_changed("created", created)
+        if updated:
+            await shifts_changed("updated", updated, [existing[doc["id"]] for doc in updated])
+        return [row for index, row in enumerate(rows) if index in failed]
+
+# Accepts CSV with the export's header (id, user_name and created_at
+# optional) or NDJSON, as a raw body or a multipart "file" field. Rows with
+# an id update that shift, so an export can be re-imported as is.
+@api_router.post("/shifts/import")
+async def import_shifts(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    on_conflict: str = Query("skip", pattern="^(skip|replace)$"),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can import shifts")
+    
+    await store_cache.ensure_loaded()
+    shift_import = ShiftImport(user, on_conflict)
+    parse_rows = csv_rows if format == "csv" else ndjson_rows
+    
+    chunk = []
+    claimed = {}
+    by_id = {}
+    async for row in parse_rows(upload_lines(request)):
+        shift_import.counts["rows"] += 1
+        row_number = shift_import.counts["rows"]
+        try:
+            doc = shift_import.parse(row)
+        except ValueError as e:
+            shift_import.reject(row_number, "invalid", str(e))
+            continue
+        
+        entry = (row_number, doc)
+        same_id = by_id.get(doc["id"])
+        # Two active rows for one slot in the same chunk: the later one wins
+        # with replace, otherwise the earlier one stays. An earlier copy of
+        # the same shift is not a rival.
+        if doc["status"] in ACTIVE_STATUSES:
+            earlier = claimed.get(slot_key(doc))
+            if earlier is not None and earlier is not same_id:
+                if on_conflict == "skip":
+                    shift_import.reject(row_number, "conflicts", "Slot is taken by an earlier row")
+                    continue
+                chunk = [other for other in chunk if other is not earlier]
+                if by_id.get(earlier[1]["id"]) is earlier:
+                    del by_id[earlier[1]["id"]]
+                shift_import.reject(earlier[0], "conflicts", "Slot is taken by a later row")
+            claimed[slot_key(doc)] = entry
+        
+        # The same id twice in a chunk: the later row is the one written
+        if same_id is not None:
+            chunk = [other for other in chunk if other is not same_id]
+            if claimed.get(slot_key(same_id[1])) is same_id:
+                del claimed[slot_key(same_id[1])]
+            shift_import.reject(same_id[0], "invalid", f"Shift {doc['id']} is repeated by a later row")
+        by_id[doc["id"]] = entry
+        chunk.append(entry)
+        
+        if len(chunk) >= STREAM_BATCH_SIZE:
+            await shift_import.write(chunk)
+            chunk = []
+            claimed = {}
+            by_id = {}
+    
+    if chunk:
+        await shift_import.write(chunk)
+    
+    return {**shift_import.counts, "errors": shift_import.errors}
+
+def new_shift(shift_data: ShiftCreate, user: User, created_at: str) -> Shift:
+    return Shift(
+        id=str(uuid.uuid4()),
+        store_id=shift_data.store_id,
+        user_id=user.id,
+        user_name=user.name,
+        day_of_week=shift_data.day_of_week,
+        time_slot=shift_data.time_slot,
+        shift_type=shift_data.shift_type,
+        notes=shift_data.notes,
+        status="pending" if user.role != "admin" else "approved",
+        week_start=shift_data.week_start,
+        created_at=created_at
+    )
+
+def slot_key(shift_doc: dict) -> tuple:
+    return (
+        shift_doc["store_id"],
+        shift_doc["week_start"],
+        shift_doc["day_of_week"],
+        shift_doc["time_slot"],
+    )
 
-class ConflictCheck(BaseModel):
-    store_id: str
-    day_of_week: int
-    time_slot: str
-    week_start: str
-    exclude_shift_id: Optional[str] = None
+def check_batch_size(size: int):
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the maximum of {MAX_BATCH_SIZE} items"
+        )
 
-# Mock authentication - in production, use proper JWT
-async def get_current_user(authorization: Optional[str] = Header(None)) -> User:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
+@api_router.post("/shifts", response_model=Shift)
+async def create_shift(
+    shift_data: ShiftCreate,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
     
-    user_id = authorization.replace("Bearer ", "")
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if shift_data.store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    if not user_doc:
-        raise HTTPException(status_code=401, detail="User not found")
+    await store_cache.ensure_loaded()
+    check_slot(shift_data.store_id, shift_data.time_slot)
     
-    return User(**user_doc)
+    shift = new_shift(shift_data, user, datetime.now(timezone.utc).isoformat())
+    
+    other_shift = await user_intervals.overlapping(shift.model_dump())
+    if other_shift:
+        raise double_booking(shift.model_dump(), other_shift)
+    
+    try:
+        await db.shifts.insert_one(shift.model_dump())
+    except DuplicateKeyError:
+        raise await slot_conflict(shift.model_dump())
+    
+    shift_doc = shift.model_dump()
+    await shifts_changed("created", [shift_doc])
+    return trusted_response(shift_doc)
 
-# Auth endpoints
-@api_router.post("/auth/login")
-async def login(request: LoginRequest):
-    user_doc = await db.users.find_one({"email": request.email}, {"_id": 0})
+# Batch shift endpoints. Registered before the /shifts/{shift_id} routes so
+# "batch" is never captured as a shift id.
+@api_router.post("/shifts/batch")
+async def create_shifts_batch(
+    batch: ShiftBatchCreate,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    check_batch_size(len(batch.shifts))
     
-    if not user_doc:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+    await store_cache.ensure_loaded()
+    created_at = datetime.now(timezone.utc).isoformat()
+    results = []
+    docs = []
+    doc_positions = []
+    claimed_slots = set()
+    # Shifts accepted so far in this batch, per week, for the overlap check
+    claimed_intervals = defaultdict(lambda: UserWeekIntervals([]))
     
-    if not bcrypt.checkpw(request.password.encode(), user_doc["password_hash"].encode()):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+    for index, shift_data in enumerate(batch.shifts):
+        if shift_data.store_id not in user.store_ids:
+            results.append({"index": index, "status": "forbidden", "detail": "Access denied"})
+            continue
+        
+        if not store_cache.offers(shift_data.store_id, shift_data.time_slot):
+            results.append({
+                "index": index,
+                "status": "invalid",
+                "detail": f"Time slot '{shift_data.time_slot}' is not offered by store {shift_data.store_id}"
+            })
+            continue
+        
+        shift = new_shift(shift_data, user, created_at)
+        doc = shift.model_dump()
+        if slot_key(doc) in claimed_slots:
+            results.append({
+                "index": index,
+                "status": "conflict",
+                "detail": "Slot is taken by an earlier shift in this batch"
+            })
+            continue
+        
+        interval = shift_interval(doc)
+        other_shift = None
+        if interval is not None:
+            other_shift = (
+                claimed_intervals[doc["week_start"]].overlapping(interval[0], interval[1])
+                or await user_intervals.overlapping(doc)
+            )
+        if other_shift:
+            results.append({
+                "index": index,
+                "status": "conflict",
+                "detail": double_booking(doc, other_shift).detail["message"]
+            })
+            continue
+        
+        claimed_slots.add(slot_key(doc))
+        claimed_intervals[doc["week_start"]].apply("created", doc)
+        results.append({"index": index, "status": "created", "shift": shift})
+        docs.append(doc)
+        doc_positions.append(index)
+    
+    if docs:
+        for rejected in await insert_shifts(docs):
+            index = doc_positions[rejected]
+            results[index] = {
+                "index": index,
+                "status": "conflict",
+                "detail": "Conflict detected! This slot is already taken."
+            }
     
+    await shifts_changed("created", [r["shift"].model_dump() for r in results if r["status"] == "created"])
     return {
-        "token": user_doc["id"],
-        "user": User(**user_doc)
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "results": results
     }
 
-@api_router.get("/auth/me", response_model=User)
-async def get_me(authorization: Optional[str] = Header(None)):
-    return await get_current_user(authorization)
-
-# Store endpoints
-@api_router.get("/stores", response_model=List[Store])
-async def get_stores(authorization: Optional[str] = Header(None)):
-    user = await get_current_user(authorization)
-    stores = await db.stores.find({"id": {"$in": user.store_ids}}, {"_id": 0}).to_list(100)
-    return stores
-
-@api_router.get("/stores/{store_id}", response_model=Store)
-async def get_store(store_id: str, authorization: Optional[str] = Header(None)):
-    user = await get_current_user(authorization)
+async def set_batch_status(shift_ids: List[str], status: str) -> dict:
+    check_batch_size(len(shift_ids))
+    shift_ids = list(dict.fromkeys(shift_ids))
     
-    if store_id not in user.store_ids:
-        raise HTTPException(status_code=403, detail="Access denied")
+    found = await db.shifts.find({"id": {"$in": shift_ids}}, SHIFT_PROJECTION).to_list(None)
+    shifts_by_id = {doc["id"]: doc for doc in found}
     
-    store = await db.stores.find_one({"id": store_id}, {"_id": 0})
+    results = {}
+    operations = []
+    operation_ids = []
+    claimed_slots = set()
+    # Shifts reactivated so far in this batch, per user and week
+    claimed_intervals = defaultdict(lambda: UserWeekIntervals([]))
     
-    if not store:
-        raise HTTPException(status_code=404, detail="Store not found")
+    if status in ACTIVE_STATUSES:
+        await store_cache.ensure_loaded()
     
-    return Store(**store)
+    for shift_id in shift_ids:
+        doc = shifts_by_id.get(shift_id)
+        if not doc:
+            results[shift_id] = "not_found"
+            continue
+        
+        # A reactivated shift needs its slot back and must not overlap the
+        # user's other active shifts, including ones earlier in the batch
+        if status in ACTIVE_STATUSES and doc["status"] not in ACTIVE_STATUSES:
+            if slot_key(doc) in claimed_slots:
+                results[shift_id] = "conflict"
+                continue
+            interval = shift_interval(doc)
+            if interval is not None:
+                claimed = claimed_intervals[(doc["user_id"], doc["week_start"])]
+                if (
+                    claimed.overlapping(interval[0], interval[1])
+                    or await user_intervals.overlapping(doc, exclude_shift_id=shift_id)
+                ):
+                    results[shift_id] = "conflict"
+                    continue
+                claimed.apply("created", {**doc, "status": status})
+            claimed_slots.add(slot_key(doc))
+        
+        results[shift_id] = status
+        operations.append(UpdateOne({"id": shift_id}, {"$set": {"status": status}}))
+        operation_ids.append(shift_id)
+    
+    if operations:
+        _, rejected = await skip_duplicates(db.shifts.bulk_write(operations, ordered=False))
+        for index in rejected:
+            results[operation_ids[index]] = "conflict"
+    
+    changed_ids = [shift_id for shift_id, result in results.items() if result == status]
+    await shifts_changed(
+        "updated",
+        [{**shifts_by_id[shift_id], "status": status} for shift_id in changed_ids],
+        [shifts_by_id[shift_id] for shift_id in changed_ids]
+    )
+    return {
+        "updated": sum(1 for r in results.values() if r == status),
+        "results": [{"id": shift_id, "status": result} for shift_id, result in results.items()]
+    }
 
-# Shift endpoints
-@api_router.get("/shifts", response_model=List[Shift])
-async def get_shifts(
-    store_id: str,
-    week_start: str,
+@api_router.post("/shifts/batch/approve")
+async def approve_shifts_batch(
+    batch: ShiftIdBatch,
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(authorization)
     
-    if store_id not in user.store_ids:
-        raise HTTPException(status_code=403, detail="Access denied")
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can approve shifts")
     
-    shifts = await db.shifts.find(
-        {"store_id": store_id, "week_start": week_start},
-        {"_id": 0}
-    ).to_list(1000)
+    return await set_batch_status(batch.shift_ids, "approved")
+
+@api_router.post("/shifts/batch/reject")
+async def reject_shifts_batch(
+    batch: ShiftIdBatch,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can reject shifts")
     
-    return shifts
+    return await set_batch_status(batch.shift_ids, "rejected")
 
-@api_router.post("/shifts", response_model=Shift)
-async def create_shift(
-    shift_data: ShiftCreate,
+@api_router.post("/shifts/batch/delete")
+async def delete_shifts_batch(
+    batch: ShiftIdBatch,
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(authorization)
     
-    if shift_data.store_id not in user.store_ids:
-        raise HTTPException(status_code=403, detail="Access denied")
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can delete shifts")
     
-    shift = Shift(
-        id=str(uuid.uuid4()),
-        store_id=shift_data.store_id,
-        user_id=user.id,
-        user_name=user.name,
-        day_of_week=shift_data.day_of_week,
-        time_slot=shift_data.time_slot,
-        shift_type=shift_data.shift_type,
-        notes=shift_data.notes,
-        status="pending" if user.role != "admin" else "approved",
-        week_start=shift_data.week_start,
-        created_at=datetime.now(timezone.utc).isoformat()
-    )
+    check_batch_size(len(batch.shift_ids))
+    shift_ids = list(dict.fromkeys(batch.shift_ids))
+    
+    found = await db.shifts.find({"id": {"$in": shift_ids}}, SHIFT_PROJECTION).to_list(None)
+    found_ids = {doc["id"] for doc in found}
+    
+    if found_ids:
+        await db.shifts.delete_many({"id": {"$in": list(found_ids)}})
+        await shifts_changed("deleted", found)
+    
+    return {
+        "deleted": len(found_ids),
+        "results": [
+            {"id": shift_id, "status": "deleted" if shift_id in found_ids else "not_found"}
+            for shift_id in shift_ids
+        ]
+    }
+
+async def missing_or_forbidden(shift_id: str, user: User, time_slot: Optional[str] = None) -> HTTPException:
+    # Only reached when an atomic update matched nothing
+    existing_shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0, "store_id": 1, "user_id": 1})
+    
+    if not existing_shift:
+        return HTTPException(status_code=404, detail="Shift not found")
+    
+    if existing_shift["user_id"] != user.id and user.role != "admin":
+        return HTTPException(status_code=403, detail="Access denied")
+    
+    if time_slot is not None and not store_cache.offers(existing_shift["store_id"], time_slot):
+        return HTTPException(
+            status_code=422,
+            detail=f"Time slot '{time_slot}' is not offered by store {existing_shift['store_id']}"
+        )
+    
+    return HTTPException(status_code=403, detail="Access denied")
+
+async def set_shift_status(shift_id: str, status: str) -> Shift:
+    # Approving a pending shift or rejecting anything can't create an
+    # overlap, so only a shift coming back from rejected is read first
+    query = {"id": shift_id}
+    if status in ACTIVE_STATUSES:
+        query["status"] = {"$in": ACTIVE_STATUSES}
     
-    await db.shifts.insert_one(shift.model_dump())
-    return shift
+    # The document before the write feeds the rollup deltas; the new one
+    # only differs in status
+    try:
+        previous_shift = await db.shifts.find_one_and_update(
+            query,
+            {"$set": {"status": status}},
+            projection=SHIFT_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+        if not previous_shift and status in ACTIVE_STATUSES:
+            current_shift = await db.shifts.find_one({"id": shift_id}, SHIFT_PROJECTION)
+            if current_shift:
+                await store_cache.ensure_loaded()
+                other_shift = await user_intervals.overlapping(current_shift, exclude_shift_id=shift_id)
+                if other_shift:
+                    raise double_booking(current_shift, other_shift)
+                # Matching the old status keeps a concurrent change from
+                # slipping in between the check and the update
+                previous_shift = await db.shifts.find_one_and_update(
+                    {"id": shift_id, "status": current_shift["status"]},
+                    {"$set": {"status": status}},
+                    projection=SHIFT_PROJECTION,
+                    return_document=ReturnDocument.BEFORE
+                )
+    except DuplicateKeyError:
+        existing_shift = await db.shifts.find_one({"id": shift_id}, SHIFT_PROJECTION)
+        raise await slot_conflict(existing_shift)
+    
+    if not previous_shift:
+        raise HTTPException(status_code=404, detail="Shift not found")
+    
+    updated_shift = {**previous_shift, "status": status}
+    await shifts_changed("updated", [updated_shift], [previous_shift])
+    return trusted_response(updated_shift)
 
 @api_router.put("/shifts/{shift_id}", response_model=Shift)
 async def update_shift(
@@ -183,23 +3218,51 @@ async def update_shift(
 ):
     user = await get_current_user(authorization)
     
-    existing_shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
+    query = {"id": shift_id}
+    if user.role != "admin":
+        query["user_id"] = user.id
+    
+    update_data = {k: v for k, v in shift_data.model_dump().items() if v is not None}
     
-    if not existing_shift:
-        raise HTTPException(status_code=404, detail="Shift not found")
+    # The store isn't known before the update, so restrict the match to
+    # stores offering the new slot rather than spending a lookup on it
+    if "time_slot" in update_data:
+        await store_cache.ensure_loaded()
+        query["store_id"] = {"$in": store_cache.stores_offering(update_data["time_slot"])}
     
-    if existing_shift["user_id"] != user.id and user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access denied")
+    # Moving a shift needs its owner and week for the overlap check, so
+    # only moves pay for reading it first
+    if "day_of_week" in update_data or "time_slot" in update_data:
+        current_shift = await db.shifts.find_one(query, SHIFT_PROJECTION)
+        if current_shift and current_shift["status"] in ACTIVE_STATUSES:
+            await store_cache.ensure_loaded()
+            moved_shift = {**current_shift, **update_data}
+            other_shift = await user_intervals.overlapping(moved_shift, exclude_shift_id=shift_id)
+            if other_shift:
+                raise double_booking(moved_shift, other_shift)
     
-    update_data = {k: v for k, v in shift_data.model_dump().items() if v is not None}
+    # The document before the write feeds the rollup deltas
+    if not update_data:
+        previous_shift = await db.shifts.find_one(query, SHIFT_PROJECTION)
+    else:
+        try:
+            previous_shift = await db.shifts.find_one_and_update(
+                query,
+                {"$set": update_data},
+                projection=SHIFT_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            existing_shift = await db.shifts.find_one({"id": shift_id}, SHIFT_PROJECTION)
+            raise await slot_conflict({**existing_shift, **update_data})
     
-    await db.shifts.update_one(
-        {"id": shift_id},
-        {"$set": update_data}
-    )
+    if not previous_shift:
+        raise await missing_or_forbidden(shift_id, user, update_data.get("time_slot"))
     
-    updated_shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
-    return Shift(**updated_shift)
+    updated_shift = {**previous_shift, **update_data}
+    if update_data:
+        await shifts_changed("updated", [updated_shift], [previous_shift])
+    return trusted_response(updated_shift)
 
 @api_router.delete("/shifts/{shift_id}")
 async def delete_shift(
@@ -208,15 +3271,15 @@ async def delete_shift(
 ):
     user = await get_current_user(authorization)
     
-    existing_shift = await db.shifts.find_one({"id": shift_id})
-    
-    if not existing_shift:
-        raise HTTPException(status_code=404, detail="Shift not found")
-    
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can delete shifts")
     
-    await db.shifts.delete_one({"id": shift_id})
+    deleted_shift = await db.shifts.find_one_and_delete({"id": shift_id}, projection=SHIFT_PROJECTION)
+    
+    if not deleted_shift:
+        raise HTTPException(status_code=404, detail="Shift not found")
+    
+    await shifts_changed("deleted", [deleted_shift])
     return {"message": "Shift deleted"}
 
 @api_router.post("/shifts/{shift_id}/approve")
@@ -229,18 +3292,7 @@ async def approve_shift(
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can approve shifts")
     
-    existing_shift = await db.shifts.find_one({"id": shift_id})
-    
-    if not existing_shift:
-        raise HTTPException(status_code=404, detail="Shift not found")
-    
-    await db.shifts.update_one(
-        {"id": shift_id},
-        {"$set": {"status": "approved"}}
-    )
-    
-    updated_shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
-    return Shift(**updated_shift)
+    return await set_shift_status(shift_id, "approved")
 
 @api_router.post("/shifts/{shift_id}/reject")
 async def reject_shift(
@@ -252,53 +3304,435 @@ async def reject_shift(
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can reject shifts")
     
-    existing_shift = await db.shifts.find_one({"id": shift_id})
+    return await set_shift_status(shift_id, "rejected")
+
+# Conflict checks are answered from the week snapshot's occupancy index.
+# It is advisory only; the active_slot_unique index still guards writes.
+@api_router.post("/shifts/check-conflict")
+async def check_conflict(
+    conflict_data: ConflictCheck,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if conflict_data.store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    if not existing_shift:
-        raise HTTPException(status_code=404, detail="Shift not found")
+    schedule = await week_schedules.get(conflict_data.store_id, conflict_data.week_start)
+    existing_shift = schedule.occupant(
+        conflict_data.day_of_week,
+        conflict_data.time_slot,
+        conflict_data.exclude_shift_id
+    )
+    
+    # The shift being moved belongs to whoever holds it, not necessarily the
+    # caller; it is usually in this week's snapshot already
+    owner_id = user.id
+    if conflict_data.exclude_shift_id:
+        moved = schedule.shifts.get(conflict_data.exclude_shift_id) or await db.shifts.find_one(
+            {"id": conflict_data.exclude_shift_id, "store_id": {"$in": user.store_ids}},
+            {"_id": 0, "user_id": 1}
+        )
+        if moved:
+            owner_id = moved["user_id"]
     
-    await db.shifts.update_one(
-        {"id": shift_id},
-        {"$set": {"status": "rejected"}}
+    # The owner's shifts at any store that overlap the slot
+    await store_cache.ensure_loaded()
+    overlapping_shift = await user_intervals.overlapping(
+        {
+            "id": None,
+            "user_id": owner_id,
+            "store_id": conflict_data.store_id,
+            "week_start": conflict_data.week_start,
+            "day_of_week": conflict_data.day_of_week,
+            "time_slot": conflict_data.time_slot,
+        },
+        conflict_data.exclude_shift_id
     )
     
-    updated_shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
-    return Shift(**updated_shift)
+    return {
+        "has_conflict": existing_shift is not None or overlapping_shift is not None,
+        "conflicting_shift": existing_shift,
+        "overlapping_shift": overlapping_shift
+    }
 
-@api_router.post("/shifts/check-conflict")
-async def check_conflict(
-    conflict_data: ConflictCheck,
+# Checks many candidate slots of one week at once; with no slots given,
+# every (day, time_slot) of the store's grid is checked
+@api_router.post("/shifts/check-conflicts")
+async def check_conflicts(
+    conflict_data: ConflictBatchCheck,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if conflict_data.store_id not in user.store_ids:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    schedule = await week_schedules.get(conflict_data.store_id, conflict_data.week_start)
+    slots = conflict_data.slots
+    if slots is None:
+        slots = [
+            SlotRef(day_of_week=day, time_slot=time_slot)
+            for day in range(7)
+            for time_slot in schedule.time_slots
+        ]
+    else:
+        check_batch_size(len(slots))
+    
+    results = []
+    for slot in slots:
+        existing_shift = schedule.occupant(slot.day_of_week, slot.time_slot, conflict_data.exclude_shift_id)
+        results.append({
+            "day_of_week": slot.day_of_week,
+            "time_slot": slot.time_slot,
+            "has_conflict": existing_shift is not None,
+            "conflicting_shift_id": existing_shift["id"] if existing_shift else None
+        })
+    
+    return {"results": results}
+
+# Staffing reports, answered from db.shift_rollups without touching db.shifts
+# Filter on the stores a user may see (all of them by default) and a week range
+def store_week_query(user: User, store_ids: Optional[List[str]], week_from: Optional[str], week_to: Optional[str]) -> dict:
+    store_ids = store_ids or user.store_ids
+    if any(store_id not in user.store_ids for store_id in store_ids):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    query = {"store_id": {"$in": store_ids}}
+    week_range = {}
+    if week_from:
+        week_range["$gte"] = week_from
+    if week_to:
+        week_range["$lte"] = week_to
+    if week_range:
+        query["week_start"] = week_range
+    return query
+
+def weeks_between(week_from: Optional[str], week_to: Optional[str]) -> Optional[int]:
+    try:
+        days = (datetime.fromisoformat(week_to) - datetime.fromisoformat(week_from)).days
+    except (TypeError, ValueError):
+        return None
+    return max(days // 7 + 1, 0)
+
+@api_router.get("/reports/hours")
+async def report_hours(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
     authorization: Optional[str] = Header(None)
 ):
     user = await get_current_user(authorization)
+    query = store_week_query(user, store_ids, week_from, week_to)
+    
+    totals = {}
+    async for rollup in db.shift_rollups.find(query, {"_id": 0, "store_id": 1, "users": 1}):
+        for user_id, entry in rollup["users"].items():
+            # Staff only see their own hours; entries left at zero by deletes are skipped
+            if (user.role != "admin" and user_id != user.id) or not entry["shifts"]:
+                continue
+            row = totals.setdefault(user_id, {
+                "user_id": user_id,
+                "user_name": entry["user_name"],
+                "approved_hours": 0.0,
+                "pending_hours": 0.0,
+                "shifts": 0,
+                "stores": {},
+            })
+            row["approved_hours"] += entry["approved_minutes"] / 60
+            row["pending_hours"] += entry["pending_minutes"] / 60
+            row["shifts"] += entry["shifts"]
+            row["stores"][rollup["store_id"]] = (
+                row["stores"].get(rollup["store_id"], 0.0)
+                + (entry["approved_minutes"] + entry["pending_minutes"]) / 60
+            )
     
-    query = {
-        "store_id": conflict_data.store_id,
-        "day_of_week": conflict_data.day_of_week,
-        "time_slot": conflict_data.time_slot,
-        "week_start": conflict_data.week_start,
-        "status": {"$in": ["pending", "approved"]}
+    return {
+        "week_from": week_from,
+        "week_to": week_to,
+        "users": sorted(totals.values(), key=lambda row: row["user_name"])
     }
+
+# Coverage per store and per (day, time_slot) cell. With both ends of the
+# range given, weeks without any shift count as fully open.
+@api_router.get("/reports/coverage")
+async def report_coverage(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    query = store_week_query(user, store_ids, week_from, week_to)
     
-    if conflict_data.exclude_shift_id:
-        query["id"] = {"$ne": conflict_data.exclude_shift_id}
+    await store_cache.ensure_loaded()
+    filled = defaultdict(lambda: defaultdict(int))
+    weeks_seen = defaultdict(int)
+    async for rollup in db.shift_rollups.find(query, {"_id": 0, "store_id": 1, "cells": 1}):
+        weeks_seen[rollup["store_id"]] += 1
+        for key, cell in rollup["cells"].items():
+            day_of_week, time_slot = key.split(" ", 1)
+            for status in ACTIVE_STATUSES:
+                filled[rollup["store_id"]][(int(day_of_week), time_slot, status)] += cell[status]
+    
+    range_weeks = weeks_between(week_from, week_to)
+    stores = []
+    for store_id in query["store_id"]["$in"]:
+        store = store_cache.get(store_id)
+        if store is None:
+            continue
+        weeks = range_weeks if range_weeks is not None else weeks_seen[store_id]
+        counts = filled[store_id]
+        cells = []
+        for day in range(7):
+            for time_slot in store_cache.time_slots(store_id):
+                approved = counts[(day, time_slot, "approved")]
+                pending = counts[(day, time_slot, "pending")]
+                cells.append({
+                    "day_of_week": day,
+                    "time_slot": time_slot,
+                    "approved": approved,
+                    "pending": pending,
+                    "open": max(weeks - approved - pending, 0),
+                })
+        total_slots = weeks * len(cells)
+        approved = sum(cell["approved"] for cell in cells)
+        pending = sum(cell["pending"] for cell in cells)
+        stores.append({
+            "store_id": store_id,
+            "store_name": store["name"],
+            "weeks": weeks,
+            "total_slots": total_slots,
+            "approved": approved,
+            "pending": pending,
+            "open": max(total_slots - approved - pending, 0),
+            "coverage": approved / total_slots if total_slots else 0.0,
+            "cells": cells,
+        })
+    
+    return {"week_from": week_from, "week_to": week_to, "stores": stores}
+
+@api_router.get("/reports/backlog")
+async def report_backlog(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view the approval backlog")
+    
+    query = store_week_query(user, store_ids, week_from, week_to)
+    query["status_counts.pending"] = {"$gt": 0}
+    
+    stores = {}
+    async for rollup in db.shift_rollups.find(
+        query,
+        {"_id": 0, "store_id": 1, "week_start": 1, "status_counts": 1}
+    ).sort([("week_start", ASCENDING), ("store_id", ASCENDING)]):
+        entry = stores.setdefault(rollup["store_id"], {"store_id": rollup["store_id"], "pending": 0, "weeks": []})
+        entry["pending"] += rollup["status_counts"]["pending"]
+        entry["weeks"].append({"week_start": rollup["week_start"], "pending": rollup["status_counts"]["pending"]})
     
-    existing_shift = await db.shifts.find_one(query, {"_id": 0})
+    return {
+        "pending": sum(entry["pending"] for entry in stores.values()),
+        "stores": list(stores.values())
+    }
+
+async def rebuild_rollups(query: dict) -> dict:
+    """Recompute the rollups of every (store, week) matching query from db.shifts"""
+    started = datetime.now(timezone.utc)
+    await store_cache.ensure_loaded()
+    
+    # Versions are read before the shifts, so each rebuilt rollup covers at
+    # least the writes its version stands for
+    versions = {
+        doc["_id"]: doc["version"]
+        async for doc in db.versions.find({"_id": {"$regex": "^shifts:"}})
+    }
+    
+    cursor = db.shifts.aggregate([
+        {"$match": query},
+        {"$group": {
+            "_id": {"store_id": "$store_id", "week_start": "$week_start"},
+            "shifts": {"$push": {
+                "user_id": "$user_id",
+                "user_name": "$user_name",
+                "day_of_week": "$day_of_week",
+                "time_slot": "$time_slot",
+                "status": "$status",
+            }},
+        }},
+    ], allowDiskUse=True, batchSize=STREAM_BATCH_SIZE)
+    
+    rebuilt = 0
+    pending_writes = []
+    async for group in cursor:
+        store_id, week_start = group["_id"]["store_id"], group["_id"]["week_start"]
+        pending_writes.append((
+            build_rollup(store_id, week_start, group["shifts"]),
+            versions.get(week_version_key(store_id, week_start), 0)
+        ))
+        if len(pending_writes) >= STREAM_BATCH_SIZE:
+            await write_rollups(pending_writes)
+            rebuilt += len(pending_writes)
+            pending_writes = []
+    await write_rollups(pending_writes)
+    rebuilt += len(pending_writes)
+    
+    removed = await db.shift_rollups.delete_many({**query, "computed_at": {"$lt": started}})
+    return {"rebuilt": rebuilt, "removed": removed.deleted_count}
+
+# Rebuilds rollups from db.shifts with an aggregation that groups each
+# (store, week) server-side. Use after importing data or changing a store's
+# time slots; rollups nothing maps to any more are dropped.
+@api_router.post("/reports/rebuild")
+async def rebuild_reports(
+    store_ids: Optional[List[str]] = Query(None),
+    week_from: Optional[str] = None,
+    week_to: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can rebuild reports")
+    
+    return await rebuild_rollups(store_week_query(user, store_ids, week_from, week_to))
+
+# Streams every shift, flags those whose store, day or time_slot doesn't
+# match the store definitions with invalid_reason, and clears stale flags.
+# The flag is for admins querying Mongo: SHIFT_PROJECTION keeps it out of
+# every read, so flagging changes nothing clients see and bumps no versions.
+@api_router.post("/shifts/flag-invalid")
+async def flag_invalid_shifts(
+    dry_run: bool = False,
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can flag invalid shifts")
+    
+    await store_cache.ensure_loaded()
+    scanned = 0
+    flagged = 0
+    cleared = 0
+    sample = []
+    operations = []
+    
+    cursor = db.shifts.find(
+        {},
+        {"_id": 0, "id": 1, "store_id": 1, "day_of_week": 1, "time_slot": 1, "invalid_reason": 1}
+    ).batch_size(STREAM_BATCH_SIZE)
+    async for doc in cursor:
+        scanned += 1
+        reason = invalid_slot_reason(doc)
+        if reason and doc.get("invalid_reason") != reason:
+            operations.append(UpdateOne({"id": doc["id"]}, {"$set": {"invalid_reason": reason}}))
+        elif not reason and "invalid_reason" in doc:
+            operations.append(UpdateOne({"id": doc["id"]}, {"$unset": {"invalid_reason": ""}}))
+            cleared += 1
+        if reason:
+            flagged += 1
+            if len(sample) < 20:
+                sample.append({"id": doc["id"], "reason": reason})
+        
+        if len(operations) >= STREAM_BATCH_SIZE:
+            if not dry_run:
+                await db.shifts.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations and not dry_run:
+        await db.shifts.bulk_write(operations, ordered=False)
+    
+    return {
+        "dry_run": dry_run,
+        "scanned": scanned,
+        "invalid": flagged,
+        "cleared": cleared,
+        "sample": sample
+    }
+
+# Cache stats endpoint
+@api_router.get("/cache/stats")
+async def cache_stats(authorization: Optional[str] = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view cache stats")
+    
+    return {
+        "users": user_cache.stats(),
+        "week_schedules": week_schedules.stats(),
+        "user_intervals": user_intervals.stats(),
+        "shift_events": shift_events.stats(),
+        "broadcast": cache_broadcast.stats(),
+    }
+
+@api_router.get("/hashing/stats")
+async def hashing_stats(authorization: Optional[str] = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view hashing stats")
+    
+    return password_hasher.stats()
+
+@api_router.get("/diagnostics/indexes")
+async def index_diagnostics(authorization: Optional[str] = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view diagnostics")
+    
+    queries = await explain_query_shapes()
+    return {
+        "missing_indexes": await missing_indexes(),
+        "collscans": [q for q in queries if q["collscan"]],
+        "unexpected_indexes": [q for q in queries if q.get("unexpected_index")],
+        "queries": queries,
+    }
+
+@api_router.get("/diagnostics/slow-requests")
+async def slow_requests(
+    limit: int = Query(50, ge=1, le=1000),
+    authorization: Optional[str] = Header(None)
+):
+    user = await get_current_user(authorization)
+    
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view diagnostics")
+    
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled, set PROFILING_ENABLED=1")
     
     return {
-        "has_conflict": existing_shift is not None,
-        "conflicting_shift": Shift(**existing_shift) if existing_shift else None
+        "threshold_ms": SLOW_REQUEST_MS,
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "requests": await asyncio.get_running_loop().run_in_executor(None, read_slow_requests, limit)
     }
 
 # Seed data endpoint
 @api_router.post("/seed")
 async def seed_data():
+    global tokens_not_before
     await db.users.delete_many({})
+    tokens_not_before = time.time()
+    user_cache.clear()
     await db.stores.delete_many({})
     await db.shifts.delete_many({})
+    await db.shift_rollups.delete_many({})
+    await db.shift_templates.delete_many({})
+    week_schedules.invalidate()
+    user_intervals.invalidate()
     
-    admin_password = bcrypt.hashpw("admin123".encode(), bcrypt.gensalt()).decode()
-    user_password = bcrypt.hashpw("user123".encode(), bcrypt.gensalt()).decode()
+    admin_password, user_password = await asyncio.gather(
+        password_hasher.hash("admin123"),
+        password_hasher.hash("user123"),
+    )
     
     users = [
         {
@@ -347,6 +3781,14 @@ async def seed_data():
     
     await db.users.insert_many(users)
     await db.stores.insert_many(stores)
+    # Every week was emptied, so every counter moves on
+    await db.versions.update_many({}, {"$inc": {"version": 1}})
+    await bump_versions([STORES_VERSION_KEY])
+    await store_cache.load()
+    user_cache.clear()
+    week_schedules.invalidate()
+    user_intervals.invalidate()
+    await cache_broadcast.publish("reset", not_before=tokens_not_before)
     
     return {"message": "Data seeded successfully"}
 
@@ -375,12 +3817,58 @@ else:
         expose_headers=["*"],
     )
 
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Point-in-time values from the caches and pools, read at scrape time
+def runtime_metrics() -> list:
+    metrics = []
+    for metric_type, name, documentation, value in [
+        (Counter, "user_cache_hits_total", "User cache hits", user_cache.hits),
+        (Counter, "user_cache_misses_total", "User cache misses", user_cache.misses),
+        (Gauge, "user_cache_size", "Entries in the user cache", len(user_cache._data)),
+        (Gauge, "password_hash_in_flight", "Password hashing jobs running or queued", password_hasher.in_flight),
+        (Counter, "password_hash_rejected_total", "Logins shed with 429", password_hasher.rejected),
+        (Gauge, "shift_event_subscribers", "Open shift event streams", shift_events.stats()["subscribers"]),
+    ]:
+        metric = metric_type(name, documentation)
+        metric.inc(amount=value)
+        metrics.append(metric)
+    return metrics
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@app.get("/metrics")
+async def metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return Response(
+        render_metrics(METRICS + runtime_metrics()),
+        media_type="text/plain; version=0.0.4"
+    )
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Health probes. /healthz is liveness only; /readyz also requires the warm-up
+# to have finished and Mongo to answer a ping.
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if not ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=1)
+    except Exception:
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    
+    return {"status": "ready"}
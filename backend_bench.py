@@ -0,0 +1,527 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "shiftsync_bench")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from motor.motor_asyncio import AsyncIOMotorClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+# Simulated network round trip added to every Mongo call against the stand-in
+MONGO_RTT_SECONDS = float(os.environ.get("BENCH_MONGO_RTT_MS", "1")) / 1000
+
+
+def timeit(fn, iterations):
+    """Run fn repeatedly and return per-call timings in microseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return samples[max(0, int(round(len(samples) * fraction)) - 1)]
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<48} p50 {p50:8.1f}us  p99 {p99:8.1f}us  mean {statistics.mean(samples):8.1f}us")
+
+
+def bench_token_verification(iterations=20000):
+    """Signed token issue/verify cost, no database involved"""
+    user = server.User(
+        id="admin-1",
+        name="Admin User",
+        email="admin@example.com",
+        role="admin",
+        store_ids=["store-1", "store-2", "store-3"],
+    )
+    token = server.issue_token(user)
+    print(f"Token size: {len(token)} bytes")
+    report("issue_token", timeit(lambda: server.issue_token(user), iterations))
+    report("decode_token", timeit(lambda: server.decode_token(token), iterations))
+
+
+def large_week(size):
+    return [
+        {
+            "id": f"shift-{i}",
+            "store_id": "store-1",
+            "user_id": "user-1",
+            "user_name": "John Doe",
+            "day_of_week": i % 7,
+            "time_slot": f"{i % 24:02d}:00 - {(i + 4) % 24:02d}:00",
+            "shift_type": "morning",
+            "notes": "Bench shift",
+            "status": "approved",
+            "week_start": "2026-01-05",
+            "created_at": "2026-01-01T00:00:00+00:00",
+        }
+        for i in range(size)
+    ]
+
+
+async def bench_serialization(size=1000, iterations=200):
+    """Response rendering for a large week: response_model validation vs trusted orjson"""
+    docs = large_week(size)
+    field = create_response_field(name="Response_get_shifts", type_=List[server.Shift])
+
+    async def validated():
+        content = await serialize_response(field=field, response_content=docs, is_coroutine=True)
+        return JSONResponse(content).body
+
+    validated_samples = []
+    trusted_samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await validated()
+        validated_samples.append((time.perf_counter() - start) * 1_000_000)
+        start = time.perf_counter()
+        server.trusted_response(docs).body
+        trusted_samples.append((time.perf_counter() - start) * 1_000_000)
+    report(f"{size} shifts via response_model", validated_samples)
+    report(f"{size} shifts via trusted_response", trusted_samples)
+
+
+class CountingCursor:
+    """Proxy that counts reading a cursor as one round trip"""
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        # sort(), limit() and friends return the cursor itself
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+
+        return call
+
+    async def to_list(self, length=None):
+        self._counter["round_trips"] += 1
+        await asyncio.sleep(MONGO_RTT_SECONDS)
+        return await self._cursor.to_list(length)
+
+    async def __aiter__(self):
+        self._counter["round_trips"] += 1
+        await asyncio.sleep(MONGO_RTT_SECONDS)
+        async for doc in self._cursor:
+            yield doc
+
+
+class CountingCollection:
+    """Proxy that counts awaited collection calls and cursor reads and adds a fixed RTT"""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ("find", "aggregate"):
+            return lambda *args, **kwargs: CountingCursor(attr(*args, **kwargs), self._counter)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self._counter["round_trips"] += 1
+            await asyncio.sleep(MONGO_RTT_SECONDS)
+            return await attr(*args, **kwargs)
+
+        return call
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.counter = {"round_trips": 0}
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._database, name), self.counter)
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self.counter)
+
+
+async def bench_shift_endpoints(iterations=200):
+    """Round trips and latency per shift mutation endpoint"""
+    database = CountingDatabase(AsyncMongoMockClient()["shiftsync_bench"])
+    server.db = database
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api") as http:
+        await http.post("/seed")
+        response = await http.post("/auth/login", json={"email": "admin@example.com", "password": "admin123"})
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        shift_ids = []
+        for i in range(iterations):
+            response = await http.post("/shifts", headers=headers, json={
+                "store_id": "store-1",
+                "day_of_week": i % 7,
+                "time_slot": "09:00 - 13:00",
+                "shift_type": "morning",
+                "week_start": f"bench-{i // 7}",
+            })
+            shift_ids.append(response.json()["id"])
+
+        endpoints = [
+            ("PUT /shifts/{id}", lambda sid: http.put(f"/shifts/{sid}", headers=headers, json={"notes": "bench"})),
+            ("POST /shifts/{id}/reject", lambda sid: http.post(f"/shifts/{sid}/reject", headers=headers)),
+            ("POST /shifts/{id}/approve", lambda sid: http.post(f"/shifts/{sid}/approve", headers=headers)),
+            ("DELETE /shifts/{id}", lambda sid: http.delete(f"/shifts/{sid}", headers=headers)),
+        ]
+        for name, request in endpoints:
+            samples = []
+            database.counter["round_trips"] = 0
+            for sid in shift_ids:
+                start = time.perf_counter()
+                response = await request(sid)
+                samples.append((time.perf_counter() - start) * 1_000_000)
+                assert response.status_code == 200, response.text
+            round_trips = database.counter["round_trips"] / len(shift_ids)
+            report(f"{name} ({round_trips:.1f} round trips)", samples)
+
+
+async def bench_auto_roster(stores=50, weeks=4, staff=200):
+    """Auto-fill of every open cell across many stores and weeks in one call"""
+    database = AsyncMongoMockClient()["shiftsync_bench"]
+    server.db = database
+    server.store_cache.version = None
+    rng = random.Random(7)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api") as http:
+        await http.post("/seed")
+        store_ids = [f"bench-store-{i}" for i in range(stores)]
+        await database.stores.insert_many([
+            {"id": store_id, "name": store_id, "time_slots": ["06:00 - 12:00", "12:00 - 18:00", "18:00 - 00:00"]}
+            for store_id in store_ids
+        ])
+        await database.users.insert_many([
+            {
+                "id": f"bench-user-{i}",
+                "name": f"Bench User {i}",
+                "email": f"bench-{i}@example.com",
+                "role": "user",
+                "store_ids": rng.sample(store_ids, 5),
+            }
+            for i in range(staff)
+        ])
+        await database.users.update_one({"id": "admin-1"}, {"$push": {"store_ids": {"$each": store_ids}}})
+        await server.store_cache.load()
+
+        response = await http.post("/auth/login", json={"email": "admin@example.com", "password": "admin123"})
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        roster = {"store_ids": store_ids, "week_starts": week_starts(weeks)}
+
+        for label, dry_run in (("planning only", True), ("with bulk insert", False)):
+            start = time.perf_counter()
+            response = await http.post("/schedule/auto-fill", headers=headers, json={**roster, "dry_run": dry_run})
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.text
+            result = response.json()
+            print(
+                f"{stores} stores x {weeks} weeks, {label:<17} {elapsed * 1000:8.1f}ms  "
+                f"{len(result['shifts'])} assigned, {len(result['unfilled'])} unfilled"
+            )
+
+
+# Load test: concurrent clients running a realistic request mix
+
+# (scenario, weight) - weights are relative
+SCENARIO_MIX = [
+    ("week_fetch", 50),
+    ("week_revalidate", 10),
+    ("move_shift", 15),
+    ("create_shift", 10),
+    ("approve_storm", 5),
+    ("login", 5),
+    ("check_conflict", 5),
+]
+
+# Statuses that are expected outcomes rather than errors
+EXPECTED_STATUSES = {200, 304, 409}
+
+
+def week_starts(count):
+    monday = date(2026, 1, 5)
+    return [(monday + timedelta(weeks=i)).isoformat() for i in range(count)]
+
+
+class LoadRunner:
+    def __init__(self, http, weeks, stores):
+        self.http = http
+        self.weeks = weeks
+        self.stores = stores
+        self.tokens = {}
+        self.etags = {}
+        self.shift_ids = []
+        self.pending_ids = []
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, label, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await self.http.request(method, url, **kwargs)
+        self.samples[label].append((time.perf_counter() - start) * 1000)
+        if response.status_code not in EXPECTED_STATUSES:
+            self.errors[label] += 1
+        return response
+
+    def headers(self, who):
+        return {"Authorization": f"Bearer {self.tokens[who]}"}
+
+    def random_slot(self):
+        store = random.choice(self.stores)
+        return {
+            "store_id": store["id"],
+            "week_start": random.choice(self.weeks),
+            "day_of_week": random.randrange(7),
+            "time_slot": random.choice(store["time_slots"]),
+        }
+
+    async def login(self, who, email, password):
+        response = await self.call("POST /auth/login", "POST", "/auth/login", json={"email": email, "password": password})
+        self.tokens[who] = response.json()["token"]
+
+    async def setup(self, shifts_per_week):
+        await self.http.post("/seed")
+        await self.login("admin", "admin@example.com", "admin123")
+        await self.login("user", "john@example.com", "user123")
+        response = await self.http.get("/stores", headers=self.headers("admin"))
+        self.stores = [store for store in response.json() if store["id"] in ("store-1", "store-2")]
+
+        shifts = []
+        for week in self.weeks:
+            for store in self.stores:
+                slots = [(day, slot) for day in range(7) for slot in store["time_slots"]]
+                for day, slot in random.sample(slots, min(shifts_per_week, len(slots))):
+                    shifts.append({
+                        "store_id": store["id"],
+                        "week_start": week,
+                        "day_of_week": day,
+                        "time_slot": slot,
+                        "shift_type": "morning",
+                    })
+        for i in range(0, len(shifts), 500):
+            response = await self.http.post("/shifts/batch", headers=self.headers("user"), json={"shifts": shifts[i:i + 500]})
+            for result in response.json()["results"]:
+                if result["status"] == "created":
+                    self.shift_ids.append(result["shift"]["id"])
+                    self.pending_ids.append(result["shift"]["id"])
+        self.samples.clear()
+
+    async def week_fetch(self):
+        slot = self.random_slot()
+        params = {"store_id": slot["store_id"], "week_start": slot["week_start"]}
+        response = await self.call("GET /shifts", "GET", "/shifts", params=params, headers=self.headers("user"))
+        self.etags[(slot["store_id"], slot["week_start"])] = response.headers.get("etag")
+
+    async def week_revalidate(self):
+        if not self.etags:
+            return await self.week_fetch()
+        (store_id, week), etag = random.choice(list(self.etags.items()))
+        await self.call(
+            "GET /shifts (If-None-Match)", "GET", "/shifts",
+            params={"store_id": store_id, "week_start": week},
+            headers={**self.headers("user"), "If-None-Match": etag or ""},
+        )
+
+    async def move_shift(self):
+        if not self.shift_ids:
+            return
+        slot = self.random_slot()
+        await self.call(
+            "PUT /shifts/{id}", "PUT", f"/shifts/{random.choice(self.shift_ids)}",
+            json={"day_of_week": slot["day_of_week"]}, headers=self.headers("admin"),
+        )
+
+    async def create_shift(self):
+        response = await self.call(
+            "POST /shifts", "POST", "/shifts",
+            json={**self.random_slot(), "shift_type": "evening"}, headers=self.headers("user"),
+        )
+        if response.status_code == 200:
+            self.shift_ids.append(response.json()["id"])
+            self.pending_ids.append(response.json()["id"])
+
+    async def approve_storm(self):
+        batch, self.pending_ids = self.pending_ids[:500], self.pending_ids[500:]
+        if not batch:
+            return
+        await self.call(
+            "POST /shifts/batch/approve", "POST", "/shifts/batch/approve",
+            json={"shift_ids": batch}, headers=self.headers("admin"),
+        )
+
+    async def check_conflict(self):
+        await self.call(
+            "POST /shifts/check-conflict", "POST", "/shifts/check-conflict",
+            json=self.random_slot(), headers=self.headers("user"),
+        )
+
+    async def client(self, deadline):
+        scenarios = [name for name, _ in SCENARIO_MIX]
+        weights = [weight for _, weight in SCENARIO_MIX]
+        while time.perf_counter() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            if scenario == "login":
+                await self.login("user", "john@example.com", "user123")
+            else:
+                await getattr(self, scenario)()
+
+    async def run(self, clients, duration):
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(self.client(deadline) for _ in range(clients)))
+
+    def summary(self, duration):
+        results = {}
+        for label, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            results[label] = {
+                "count": len(samples),
+                "errors": self.errors[label],
+                "rps": round(len(samples) / duration, 1),
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+            }
+        return results
+
+
+def print_summary(results, duration):
+    total = sum(r["count"] for r in results.values())
+    print(f"\n{'endpoint':<32} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, r in results.items():
+        print(f"{label:<32} {r['count']:>7} {r['errors']:>5} {r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+    print(f"\nTotal: {total} requests in {duration:.1f}s ({total / duration:.1f} req/s)")
+
+
+def compare_baseline(results, baseline, tolerance):
+    """Return endpoints whose p95 grew beyond tolerance relative to the baseline"""
+    regressions = []
+    for label, r in results.items():
+        previous = baseline.get(label)
+        if previous and r["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append((label, previous["p95_ms"], r["p95_ms"]))
+    return regressions
+
+
+async def load_test(args):
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+    else:
+        if args.mongo_url:
+            mongo = AsyncIOMotorClient(args.mongo_url)
+            server.db = mongo[args.db_name]
+        else:
+            server.db = AsyncMongoMockClient()[args.db_name]
+        await server.ensure_indexes()
+        transport = httpx.ASGITransport(app=server.app)
+        http = httpx.AsyncClient(transport=transport, base_url="http://bench/api", timeout=30)
+
+    async with http:
+        runner = LoadRunner(http, week_starts(args.weeks), [])
+        await runner.setup(args.shifts_per_week)
+        await runner.run(args.clients, args.duration)
+
+    if args.mongo_url and not args.base_url:
+        await server.db.client.drop_database(args.db_name)
+
+    return runner.summary(args.duration)
+
+
+def run_load(args):
+    print(f"Load test: {args.clients} clients for {args.duration}s against "
+          f"{args.base_url or args.mongo_url or 'in-process app + mongomock'}")
+    results = asyncio.run(load_test(args))
+    print_summary(results, args.duration)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    if baseline_path.exists():
+        regressions = compare_baseline(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n❌ p95 regressions against {baseline_path} (tolerance {args.tolerance:.0%}):")
+            for label, before, after in regressions:
+                print(f"   - {label}: {before}ms -> {after}ms")
+            return 1
+        print(f"\n✅ No p95 regressions against {baseline_path}")
+    return 0
+
+
+def run_micro(args):
+    bench_token_verification()
+    print("\nResponse serialization")
+    asyncio.run(bench_serialization())
+    print(f"\nShift endpoints (simulated Mongo RTT {MONGO_RTT_SECONDS * 1000:.1f}ms)")
+    asyncio.run(bench_shift_endpoints())
+    print("\nAuto roster")
+    asyncio.run(bench_auto_roster())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShiftSync backend benchmarks")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("micro", help="token and per-endpoint round-trip microbenchmarks")
+
+    load = subcommands.add_parser("load", help="concurrent load test with a realistic request mix")
+    load.add_argument("--clients", type=int, default=20)
+    load.add_argument("--duration", type=float, default=10.0, help="seconds")
+    load.add_argument("--weeks", type=int, default=8)
+    load.add_argument("--shifts-per-week", type=int, default=15)
+    load.add_argument("--mongo-url", help="local mongod to use instead of the mongomock stand-in")
+    load.add_argument("--db-name", default="shiftsync_bench")
+    load.add_argument("--base-url", help="target a running server, e.g. http://localhost:8001/api")
+    load.add_argument("--baseline", default="backend_bench_baseline.json")
+    load.add_argument("--save-baseline", action="store_true")
+    load.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth vs baseline")
+    load.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    print("🚀 ShiftSync backend benchmarks")
+    print("=" * 60)
+
+    if args.command == "load":
+        random.seed(args.seed)
+        return run_load(args)
+    return run_micro(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
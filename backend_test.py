@@ -1,8 +1,34 @@
 import requests
+import os
 import sys
 import json
+import asyncio
 from datetime import datetime, timedelta
 
+def load_server():
+    """Import the backend for checks that run in-process; needs its requirements"""
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "shiftsync_test")
+    import server
+    return server
+
+class UploadStub:
+    """Stands in for a Starlette request: headers and a body arriving in chunks"""
+    def __init__(self, body, chunk_size, content_type="text/csv"):
+        self.headers = {"content-type": content_type}
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+async def collect(rows):
+    return [row async for row in rows]
+
 class PersonnelSchedulingTester:
     def __init__(self, base_url="https://workshift-calendar-1.preview.emergentagent.com/api"):
         self.base_url = base_url
@@ -12,6 +38,7 @@ class PersonnelSchedulingTester:
         self.tests_passed = 0
         self.stores = []
         self.shifts = []
+        self.overlap_shift = None
 
     def run_test(self, name, method, endpoint, expected_status, data=None, token=None):
         """Run a single API test"""
@@ -54,6 +81,46 @@ class PersonnelSchedulingTester:
             print(f"❌ Failed - Error: {str(e)}")
             return False, {}
 
+    def check(self, name, passed, detail=""):
+        """Record a check that runs in-process rather than over HTTP"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+        if passed:
+            self.tests_passed += 1
+            print("✅ Passed")
+        else:
+            print(f"❌ Failed - {detail}")
+        return passed
+
+    def get_raw(self, endpoint, params=None, token=None, headers=None):
+        """GET returning the response itself, for streamed bodies and status-only answers"""
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        return requests.get(f"{self.base_url}/{endpoint}", headers=headers, params=params)
+
+    def import_csv(self, name, text):
+        """Upload CSV text to the import endpoint as admin and return the summary"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+        response = requests.post(
+            f"{self.base_url}/shifts/import",
+            data=text.encode("utf-8"),
+            headers={'Content-Type': 'text/csv', 'Authorization': f'Bearer {self.admin_token}'}
+        )
+        if response.status_code != 200:
+            print(f"❌ Failed - Expected 200, got {response.status_code}")
+            return None
+        self.tests_passed += 1
+        print(f"✅ Passed - Status: 200")
+        return response.json()
+
+    def week_start(self, weeks_ahead=0):
+        """Monday of the current week, or of a later one"""
+        today = datetime.now()
+        monday = today - timedelta(days=today.weekday()) + timedelta(weeks=weeks_ahead)
+        return monday.strftime('%Y-%m-%d')
+
     def test_seed_data(self):
         """Seed the database with test data"""
         success, response = self.run_test(
@@ -263,6 +330,31 @@ class PersonnelSchedulingTester:
             return True
         return False
 
+    def test_double_booking_rejected(self):
+        """Test creating a shift in an occupied slot returns 409"""
+        if not self.shifts:
+            return False
+            
+        existing_shift = self.shifts[0]
+        shift_data = {
+            "store_id": existing_shift['store_id'],
+            "day_of_week": existing_shift['day_of_week'],
+            "time_slot": existing_shift['time_slot'],
+            "shift_type": "morning",
+            "notes": "Double booking",
+            "week_start": existing_shift['week_start']
+        }
+        
+        success, response = self.run_test(
+            "Double Booking Rejected",
+            "POST",
+            "shifts",
+            409,
+            data=shift_data,
+            token=self.admin_token
+        )
+        return success
+
     def test_get_shifts(self):
         """Test getting shifts for a store and week"""
         if not self.stores or not self.shifts:
@@ -438,6 +530,652 @@ class PersonnelSchedulingTester:
         )
         return success
 
+    def test_batch_create_and_approve(self):
+        """Test batch creating shifts as user and batch approving as admin"""
+        if not self.stores:
+            return False
+            
+        today = datetime.now()
+        days_since_monday = today.weekday()
+        week_start = (today - timedelta(days=days_since_monday)).strftime('%Y-%m-%d')
+        
+        store = self.stores[0]
+        shifts = [
+            {
+                "store_id": store['id'],
+                "day_of_week": day,
+                "time_slot": store['time_slots'][0],
+                "shift_type": "morning",
+                "notes": "Batch shift",
+                "week_start": week_start
+            }
+            for day in (4, 5, 5)
+        ]
+        
+        success, response = self.run_test(
+            "Batch Create Shifts",
+            "POST",
+            "shifts/batch",
+            200,
+            data={"shifts": shifts},
+            token=self.user_token
+        )
+        
+        if not success or response.get('created') != 2 or response['results'][2]['status'] != 'conflict':
+            return False
+            
+        shift_ids = [r['shift']['id'] for r in response['results'] if r['status'] == 'created']
+        success, response = self.run_test(
+            "Batch Approve Shifts",
+            "POST",
+            "shifts/batch/approve",
+            200,
+            data={"shift_ids": shift_ids},
+            token=self.admin_token
+        )
+        
+        if success and response.get('updated') == 2:
+            print(f"   Batch approved {response['updated']} shifts")
+            return True
+        return False
+
+    def test_conditional_gets(self):
+        """Test If-None-Match gives 304 until a shift write changes the week"""
+        params = {"store_id": "store-1", "week_start": self.week_start(8)}
+        passed = True
+        for endpoint, query in (("stores", None), ("shifts", params)):
+            response = self.get_raw(endpoint, params=query, token=self.user_token)
+            etag = response.headers.get('ETag')
+            if not self.check(f"ETag on /{endpoint}", response.status_code == 200 and etag, response.headers):
+                return False
+            response = self.get_raw(endpoint, params=query, token=self.user_token, headers={"If-None-Match": etag})
+            passed &= self.check(f"Unchanged /{endpoint} Is 304", response.status_code == 304, response.status_code)
+        
+        success, _ = self.run_test(
+            "Create Shift in Cached Week",
+            "POST",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "day_of_week": 0, "time_slot": "09:00 - 13:00",
+                  "shift_type": "morning", "week_start": params['week_start']},
+            token=self.user_token
+        )
+        if not success:
+            return False
+        response = self.get_raw("shifts", params=params, token=self.user_token, headers={"If-None-Match": etag})
+        passed &= self.check(
+            "Changed /shifts Is 200",
+            response.status_code == 200 and response.headers.get('ETag') != etag and len(response.json()) == 1,
+            response.status_code
+        )
+        return passed
+
+    def test_range_pagination(self):
+        """Test paging the NDJSON range across stores and weeks returns every row once"""
+        weeks = [self.week_start(6), self.week_start(7)]
+        created = set()
+        for week_start in weeks:
+            for day, (store_id, time_slots) in enumerate((
+                ("store-1", ("09:00 - 13:00", "13:00 - 17:00")),
+                ("store-2", ("10:00 - 14:00", "14:00 - 18:00")),
+            )):
+                for time_slot in time_slots:
+                    success, shift = self.run_test(
+                        "Create Shift for Range",
+                        "POST",
+                        "shifts",
+                        200,
+                        data={"store_id": store_id, "day_of_week": day, "time_slot": time_slot,
+                              "shift_type": "morning", "week_start": week_start},
+                        token=self.admin_token
+                    )
+                    if not success:
+                        return False
+                    created.add(shift['id'])
+        
+        params = {"store_ids": ["store-1", "store-2"], "week_from": weeks[0], "week_to": weeks[1]}
+        response = self.get_raw("shifts/range", params=params, token=self.admin_token)
+        everything = [json.loads(line)['id'] for line in response.text.splitlines()]
+        
+        paged = []
+        pages = 0
+        cursor = None
+        while True:
+            page = {**params, "limit": 3, **({"after": cursor} if cursor else {})}
+            response = self.get_raw("shifts/range", params=page, token=self.admin_token)
+            rows = [json.loads(line) for line in response.text.splitlines()]
+            pages += 1
+            cursor = rows[-1].get('next_cursor') if rows else None
+            paged += [row['id'] for row in rows if 'id' in row]
+            if not cursor or pages > len(everything):
+                break
+        
+        passed = self.check("Range Holds Created Shifts", created <= set(everything), everything)
+        passed &= self.check(
+            "Pages Match Unpaged Range",
+            paged == everything and len(set(paged)) == len(paged) and pages == -(-len(everything) // 3),
+            f"{pages} pages: {paged} vs {everything}"
+        )
+        return passed
+
+    def test_auto_roster(self):
+        """Test auto-fill keeps approved shifts, store membership, the hour cap and no overlaps"""
+        server = load_server()
+        week_start = self.week_start(9)
+        memberships = {"user-1": {"store-1", "store-2"}, "user-2": {"store-2", "store-3"}}
+        max_hours = 12
+        
+        success, shift = self.run_test(
+            "Create Shift Before Roster",
+            "POST",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "day_of_week": 0, "time_slot": "09:00 - 13:00",
+                  "shift_type": "morning", "week_start": week_start},
+            token=self.user_token
+        )
+        if not success:
+            return False
+        success, _ = self.run_test("Approve Shift Before Roster", "POST", f"shifts/{shift['id']}/approve", 200, token=self.admin_token)
+        if not success:
+            return False
+        
+        success, roster = self.run_test(
+            "Auto-Fill Two Stores",
+            "POST",
+            "schedule/auto-fill",
+            200,
+            data={"store_ids": ["store-1", "store-2"], "week_starts": [week_start], "max_hours_per_user": max_hours},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        shifts = roster['shifts']
+        
+        passed = self.check(
+            "Approved Slot Left Alone",
+            roster['created'] == len(shifts) > 0 and not any(
+                (s['store_id'], s['day_of_week'], s['time_slot']) == ("store-1", 0, "09:00 - 13:00") for s in shifts
+            ),
+            roster
+        )
+        passed &= self.check(
+            "Rostered Users Belong to the Store",
+            all(s['store_id'] in memberships.get(s['user_id'], ()) for s in shifts),
+            [(s['user_id'], s['store_id']) for s in shifts]
+        )
+        
+        hours = {user_id: 0.0 for user_id in memberships}
+        intervals = {user_id: [] for user_id in memberships}
+        for s in shifts + [shift]:
+            slot = server.parse_time_slot(s['time_slot'])
+            hours[s['user_id']] += (slot.end - slot.start) / 60
+            intervals[s['user_id']].append((s['day_of_week'] * 1440 + slot.start, s['day_of_week'] * 1440 + slot.end))
+        passed &= self.check("Hour Cap Includes Approved Shifts", all(h <= max_hours for h in hours.values()), hours)
+        overlapping = [
+            (user_id, a, b)
+            for user_id, spans in intervals.items()
+            for a, b in zip(sorted(spans), sorted(spans)[1:])
+            if b[0] < a[1]
+        ]
+        passed &= self.check("Roster Has No Overlaps", not overlapping, overlapping)
+        
+        success, _ = self.run_test(
+            "Auto-Fill Non-ISO Week",
+            "POST",
+            "schedule/auto-fill",
+            422,
+            data={"store_ids": ["store-1"], "week_starts": ["not a week"]},
+            token=self.admin_token
+        )
+        return passed and success
+
+    def test_time_slot_parsing(self):
+        """Test time slot labels parse to minutes, wrapping past midnight"""
+        server = load_server()
+        cases = [
+            ("09:00 - 13:00", (540, 780)),
+            ("9:30-13:00", (570, 780)),
+            ("22:00 - 06:00", (1320, 1800)),
+            ("18:00 - 00:00", (1080, 1440)),
+            ("25:00 - 26:00", None),
+            ("09:60 - 10:00", None),
+            ("morning", None),
+        ]
+        passed = True
+        for label, expected in cases:
+            slot = server.parse_time_slot(label)
+            got = (slot.start, slot.end) if slot else None
+            passed &= self.check(f"Parse Time Slot '{label}'", got == expected, f"got {got}, expected {expected}")
+        return passed
+
+    def test_interval_overlaps(self):
+        """Test per-user interval lookups, across midnight and the week boundary"""
+        server = load_server()
+        slots = ["09:00 - 13:00", "12:00 - 16:00", "13:00 - 17:00", "22:00 - 06:00", "05:00 - 09:00"]
+        server.store_cache._slots["unit-store"] = {label: server.parse_time_slot(label) for label in slots}
+        
+        def shift(shift_id, day, time_slot, week_start="2026-10-12"):
+            return {"id": shift_id, "store_id": "unit-store", "user_id": "unit-user", "status": "approved",
+                    "day_of_week": day, "time_slot": time_slot, "week_start": week_start}
+        
+        def overlap(intervals, doc, exclude=None):
+            start, end, _ = server.shift_interval(doc)
+            found = intervals.overlapping(start, end, exclude)
+            return found["id"] if found else None
+        
+        week = server.UserWeekIntervals([shift("monday", 0, "09:00 - 13:00"), shift("tuesday-night", 1, "22:00 - 06:00")])
+        passed = self.check("Overlap Same Day", overlap(week, shift("x", 0, "12:00 - 16:00")) == "monday")
+        passed &= self.check("Touching Slots Do Not Overlap", overlap(week, shift("x", 0, "13:00 - 17:00")) is None)
+        passed &= self.check("Excluded Shift Ignored", overlap(week, shift("monday", 0, "12:00 - 16:00"), "monday") is None)
+        passed &= self.check("Overlap After Midnight", overlap(week, shift("x", 2, "05:00 - 09:00")) == "tuesday-night")
+        
+        # Sunday night runs into the next week's Monday morning
+        sunday = shift("sunday", 6, "22:00 - 06:00")
+        start, end, _ = server.shift_interval(sunday)
+        windows = server.week_windows(sunday["week_start"], start, end)
+        passed &= self.check("Sunday Night Checks Next Week", windows[1:] == [("2026-10-19", -120, 360)], windows)
+        next_week = server.UserWeekIntervals([shift("next-monday", 0, "05:00 - 09:00", "2026-10-19")])
+        found = next_week.overlapping(windows[1][1], windows[1][2])
+        passed &= self.check("Overlap Across Week Boundary", found is not None and found["id"] == "next-monday")
+        
+        monday = shift("early", 0, "05:00 - 09:00")
+        start, end, _ = server.shift_interval(monday)
+        windows = server.week_windows(monday["week_start"], start, end)
+        passed &= self.check("Monday Morning Checks Previous Week", windows[1:] == [("2026-10-05", 10380, 10620)], windows)
+        return passed
+
+    def test_cross_store_double_booking(self):
+        """Test a user can't work overlapping slots at two stores"""
+        week_start = self.week_start(1)
+        success, first = self.run_test(
+            "Create Shift at First Store",
+            "POST",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "day_of_week": 3, "time_slot": "13:00 - 17:00",
+                  "shift_type": "evening", "week_start": week_start},
+            token=self.user_token
+        )
+        if not success:
+            return False
+        self.overlap_shift = first
+        
+        success, response = self.run_test(
+            "Overlapping Shift at Second Store",
+            "POST",
+            "shifts",
+            409,
+            data={"store_id": "store-2", "day_of_week": 3, "time_slot": "14:00 - 18:00",
+                  "shift_type": "evening", "week_start": week_start},
+            token=self.user_token
+        )
+        return success
+
+    def test_conflict_check_for_owner(self):
+        """Test an admin's conflict check on someone else's shift uses the owner's bookings"""
+        week_start = self.week_start(10)
+        setup = [
+            ("Owner's Shift to Move", "store-1", 1, "13:00 - 17:00", self.user_token),
+            ("Owner Busy at Second Store", "store-2", 2, "14:00 - 18:00", self.user_token),
+            ("Admin Busy at Second Store", "store-2", 4, "14:00 - 18:00", self.admin_token),
+        ]
+        created = []
+        for name, store_id, day, time_slot, token in setup:
+            success, shift = self.run_test(
+                name,
+                "POST",
+                "shifts",
+                200,
+                data={"store_id": store_id, "day_of_week": day, "time_slot": time_slot,
+                      "shift_type": "evening", "week_start": week_start},
+                token=token
+            )
+            if not success:
+                return False
+            created.append(shift)
+        
+        passed = True
+        for day, expected in ((2, True), (4, False)):
+            success, response = self.run_test(
+                f"Admin Checks Move to Day {day}",
+                "POST",
+                "shifts/check-conflict",
+                200,
+                data={"store_id": "store-1", "day_of_week": day, "time_slot": "13:00 - 17:00",
+                      "week_start": week_start, "exclude_shift_id": created[0]['id']},
+                token=self.admin_token
+            )
+            passed &= success and self.check(
+                f"Move to Day {day} Conflict Is {expected}", response['has_conflict'] is expected, response
+            )
+        return passed
+
+    def test_reactivation_double_booking(self):
+        """Test approving a rejected shift is refused when it now overlaps another"""
+        shift = self.overlap_shift
+        if not shift:
+            return False
+            
+        success, _ = self.run_test(
+            "Reject First Shift",
+            "POST",
+            f"shifts/{shift['id']}/reject",
+            200,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+            
+        success, _ = self.run_test(
+            "Overlapping Shift Allowed Once Rejected",
+            "POST",
+            "shifts",
+            200,
+            data={"store_id": "store-2", "day_of_week": 3, "time_slot": "14:00 - 18:00",
+                  "shift_type": "evening", "week_start": shift['week_start']},
+            token=self.user_token
+        )
+        if not success:
+            return False
+            
+        success, _ = self.run_test(
+            "Approve Rejected Overlapping Shift",
+            "POST",
+            f"shifts/{shift['id']}/approve",
+            409,
+            token=self.admin_token
+        )
+        if not success:
+            return False
+            
+        success, response = self.run_test(
+            "Batch Approve Rejected Overlapping Shift",
+            "POST",
+            "shifts/batch/approve",
+            200,
+            data={"shift_ids": [shift['id']]},
+            token=self.admin_token
+        )
+        return success and response['results'][0]['status'] == 'conflict'
+
+    def report_hours(self, week_start):
+        """Hours per user id from the rollup-backed report for one week"""
+        success, response = self.run_test(
+            "Hours Report",
+            "GET",
+            "reports/hours",
+            200,
+            data={"week_from": week_start, "week_to": week_start},
+            token=self.admin_token
+        )
+        if not success:
+            return None
+        return {row['user_id']: (row['approved_hours'], row['pending_hours'], row['shifts']) for row in response['users']}
+
+    def test_report_totals(self):
+        """Test rollups follow creates, approvals and deletes, and match a rebuild"""
+        week_start = self.week_start(2)
+        success, shift = self.run_test(
+            "Create Shift for Reports",
+            "POST",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "day_of_week": 0, "time_slot": "09:00 - 13:00",
+                  "shift_type": "morning", "week_start": week_start},
+            token=self.user_token
+        )
+        if not success:
+            return False
+        user_id = shift['user_id']
+        
+        hours = self.report_hours(week_start)
+        if not self.check("Pending Hours Counted", hours == {user_id: (0.0, 4.0, 1)}, hours):
+            return False
+            
+        self.run_test("Approve Shift for Reports", "POST", f"shifts/{shift['id']}/approve", 200, token=self.admin_token)
+        hours = self.report_hours(week_start)
+        if not self.check("Approved Hours Counted", hours == {user_id: (4.0, 0.0, 1)}, hours):
+            return False
+            
+        success, coverage = self.run_test(
+            "Coverage Report",
+            "GET",
+            "reports/coverage",
+            200,
+            data={"week_from": week_start, "week_to": week_start},
+            token=self.admin_token
+        )
+        store = next(entry for entry in coverage['stores'] if entry['store_id'] == "store-1")
+        if not self.check("Coverage Counted", (store['approved'], store['pending'], store['total_slots']) == (1, 0, 21), store):
+            return False
+            
+        success, _ = self.run_test("Rebuild Reports", "POST", "reports/rebuild", 200, token=self.admin_token)
+        if not self.check("Rebuild Matches Incremental Totals", self.report_hours(week_start) == hours):
+            return False
+            
+        self.run_test("Delete Shift for Reports", "DELETE", f"shifts/{shift['id']}", 200, token=self.admin_token)
+        hours = self.report_hours(week_start)
+        return self.check("Deleted Shift Leaves Reports", hours == {}, hours)
+
+    def test_csv_rows(self):
+        """Test CSV import rows, with quoted fields spanning lines"""
+        server = load_server()
+        
+        async def lines(items):
+            for line in items:
+                yield line
+        
+        rows = asyncio.run(collect(server.csv_rows(lines([
+            'id,store_id,notes', '1,store-1,"line one', 'line two, with comma"',
+            '', '2,store-1,"say ""hi"""', '3,store-1,5" screen', '4,store-1,ok',
+        ]))))
+        expected = [
+            {"id": "1", "store_id": "store-1", "notes": "line one\nline two, with comma"},
+            {"id": "2", "store_id": "store-1", "notes": 'say "hi"'},
+            # A quote inside an unquoted field is literal and opens nothing
+            {"id": "3", "store_id": "store-1", "notes": '5" screen'},
+            {"id": "4", "store_id": "store-1", "notes": "ok"},
+        ]
+        passed = self.check("CSV Rows With Multi-Line Fields", rows == expected, rows)
+        
+        limit = server.IMPORT_MAX_LINE_BYTES
+        server.IMPORT_MAX_LINE_BYTES = 64
+        try:
+            rows = asyncio.run(collect(server.csv_rows(lines(
+                ['id,notes', '1,"runaway'] + ["x" * 40] * 2 + ['2,ok', '3,"never closed']
+            ))))
+        finally:
+            server.IMPORT_MAX_LINE_BYTES = limit
+        expected = [
+            {"_error": "Quoted field runs past the import line limit"},
+            {"id": "2", "notes": "ok"},
+            {"_error": "Quoted field is never closed"},
+        ]
+        return passed and self.check("CSV Quoted Field Limit", rows == expected, rows)
+
+    def test_import_repeated_id(self):
+        """Test an import with one new id on two rows writes the later row only"""
+        week_start = self.week_start(11)
+        summary = self.import_csv("Import Repeated Id", "\n".join([
+            "id,store_id,user_id,week_start,day_of_week,time_slot,status",
+            f"import-twice,store-1,user-1,{week_start},0,09:00 - 13:00,pending",
+            f"import-twice,store-1,user-1,{week_start},1,09:00 - 13:00,approved",
+        ]))
+        if summary is None:
+            return False
+        success, shifts = self.run_test(
+            "Shifts After Repeated Id",
+            "GET",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "week_start": week_start},
+            token=self.admin_token
+        )
+        return self.check(
+            "Later Row Kept",
+            (summary['created'], summary['invalid'], summary['errors'][0]['row']) == (1, 1, 1)
+            and [(s['id'], s['day_of_week'], s['status']) for s in shifts] == [("import-twice", 1, "approved")],
+            (summary, shifts)
+        )
+
+    def test_import_checks(self):
+        """Test imports refuse double bookings across stores and non-ISO weeks"""
+        week_start = self.week_start(12)
+        summary = self.import_csv("Import Overlapping Rows", "\n".join([
+            "store_id,user_id,week_start,day_of_week,time_slot",
+            f"store-1,user-1,{week_start},3,13:00 - 17:00",
+            f"store-2,user-1,{week_start},3,14:00 - 18:00",
+            "store-1,user-1,next week,3,09:00 - 13:00",
+        ]))
+        if summary is None:
+            return False
+        statuses = sorted((error['row'], error['status']) for error in summary['errors'])
+        return self.check(
+            "Import Row Checks",
+            (summary['created'], summary['conflicts'], summary['invalid']) == (1, 1, 1)
+            and statuses == [(2, "conflicts"), (3, "invalid")],
+            summary
+        )
+
+    def test_upload_lines(self):
+        """Test uploads split into lines whatever the chunking, raw or multipart"""
+        server = load_server()
+        # No trailing newline, so the last line comes from the final remainder
+        text = "\ufeffnotes\r\nCafé ☕\nÜber"
+        expected = ["notes", "Café ☕", "Über"]
+        passed = True
+        # Every chunk size up to 7 bytes splits a multi-byte character somewhere
+        for chunk_size in range(1, 8):
+            lines = asyncio.run(collect(server.upload_lines(UploadStub(text.encode("utf-8"), chunk_size))))
+            passed &= self.check(f"Raw Upload in {chunk_size}-Byte Chunks", lines == expected, lines)
+        
+        body = (
+            b'--xyz\r\nContent-Disposition: form-data; name="note"\r\n\r\nnot a file\r\n'
+            b'--xyz\r\nContent-Disposition: form-data; name="file"; filename="shifts.csv"\r\n'
+            b'Content-Type: text/csv\r\n\r\n' + text.encode("utf-8") + b'\r\n--xyz--\r\n'
+        )
+        for chunk_size in (1, 5, 64):
+            upload = UploadStub(body, chunk_size, "multipart/form-data; boundary=xyz")
+            lines = asyncio.run(collect(server.upload_lines(upload)))
+            passed &= self.check(f"Multipart Upload in {chunk_size}-Byte Chunks", lines == expected, lines)
+        return passed
+
+    def test_week_copy_skips(self):
+        """Test copying a week skips taken slots and double bookings with a reason each"""
+        source_week = self.week_start(4)
+        target_week = self.week_start(5)
+        setup = [
+            ("Copy Source Shift", source_week, "store-1", 0, "09:00 - 13:00", self.user_token),
+            ("Copy Source Shift", source_week, "store-1", 1, "13:00 - 17:00", self.user_token),
+            # Same slot taken by someone else in the target week
+            ("Target Slot Taken", target_week, "store-1", 0, "09:00 - 13:00", self.admin_token),
+            # Same user busy at another store at an overlapping time
+            ("Target User Busy", target_week, "store-2", 1, "14:00 - 18:00", self.user_token),
+        ]
+        for name, week_start, store_id, day, time_slot, token in setup:
+            success, _ = self.run_test(
+                name,
+                "POST",
+                "shifts",
+                200,
+                data={"store_id": store_id, "day_of_week": day, "time_slot": time_slot,
+                      "shift_type": "morning", "week_start": week_start},
+                token=token
+            )
+            if not success:
+                return False
+        
+        success, response = self.run_test(
+            "Copy Week",
+            "POST",
+            "schedule/copy",
+            200,
+            data={"store_id": "store-1", "week_start": source_week, "weeks": 1},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        reasons = sorted((entry['day_of_week'], entry['reason']) for entry in response['skipped'])
+        passed = self.check(
+            "Copy Skip Reasons",
+            response['created'] == 0 and reasons == [(0, "slot_taken"), (1, "double_booked")],
+            response
+        )
+        
+        success, _ = self.run_test(
+            "Copy to Non-ISO Week",
+            "POST",
+            "schedule/copy",
+            422,
+            data={"store_id": "store-1", "week_start": source_week, "week_starts": ["2026-13-01"]},
+            token=self.admin_token
+        )
+        return passed and success
+
+    def test_template_keeps_status(self):
+        """Test a template taken from a week keeps pending requests pending"""
+        source_week = self.week_start(13)
+        target_week = self.week_start(14)
+        for name, day, token in (("Pending Template Shift", 2, self.user_token), ("Approved Template Shift", 3, self.admin_token)):
+            success, _ = self.run_test(
+                name,
+                "POST",
+                "shifts",
+                200,
+                data={"store_id": "store-1", "day_of_week": day, "time_slot": "09:00 - 13:00",
+                      "shift_type": "morning", "week_start": source_week},
+                token=token
+            )
+            if not success:
+                return False
+        
+        success, template = self.run_test(
+            "Template From Week",
+            "POST",
+            "templates",
+            200,
+            data={"name": "Status check", "store_id": "store-1", "from_week": source_week},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        success, _ = self.run_test(
+            "Apply Template",
+            "POST",
+            f"templates/{template['id']}/apply",
+            200,
+            data={"week_starts": [target_week]},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        success, shifts = self.run_test(
+            "Shifts From Template",
+            "GET",
+            "shifts",
+            200,
+            data={"store_id": "store-1", "week_start": target_week},
+            token=self.admin_token
+        )
+        statuses = sorted((shift['day_of_week'], shift['status']) for shift in shifts)
+        return self.check("Template Statuses Kept", statuses == [(2, "pending"), (3, "approved")], statuses)
+
+    def test_cache_stats(self):
+        """Test admin can read user cache hit/miss counters"""
+        success, response = self.run_test(
+            "Cache Stats",
+            "GET",
+            "cache/stats",
+            200,
+            token=self.admin_token
+        )
+        
+        if success and response.get('users', {}).get('hits', 0) > 0:
+            print(f"   User cache: {response['users']['hits']} hits, {response['users']['misses']} misses")
+            return True
+        return False
+
 def main():
     print("🚀 Starting Personnel Scheduling System API Tests")
     print("=" * 60)
@@ -460,6 +1198,7 @@ def main():
         ("Create Shift (User)", tester.test_create_shift_user),
         ("Create Shift (Admin)", tester.test_create_shift_admin),
         ("Conflict Detection", tester.test_conflict_detection),
+        ("Double Booking Rejected", tester.test_double_booking_rejected),
         ("Get Shifts", tester.test_get_shifts),
         ("Update Shift", tester.test_update_shift),
         ("Approve Shift", tester.test_approve_shift),
@@ -467,6 +1206,23 @@ def main():
         ("User Cannot Approve", tester.test_user_cannot_approve),
         ("Delete Shift (Admin)", tester.test_delete_shift_admin),
         ("User Cannot Delete", tester.test_user_cannot_delete),
+        ("Batch Create and Approve", tester.test_batch_create_and_approve),
+        ("Cache Stats", tester.test_cache_stats),
+        ("Conditional GETs", tester.test_conditional_gets),
+        ("Range Pagination", tester.test_range_pagination),
+        ("Auto Roster", tester.test_auto_roster),
+        ("Time Slot Parsing", tester.test_time_slot_parsing),
+        ("Interval Overlaps", tester.test_interval_overlaps),
+        ("Cross-Store Double Booking", tester.test_cross_store_double_booking),
+        ("Reactivation Double Booking", tester.test_reactivation_double_booking),
+        ("Conflict Check for Owner", tester.test_conflict_check_for_owner),
+        ("Report Totals", tester.test_report_totals),
+        ("CSV Rows", tester.test_csv_rows),
+        ("Upload Lines", tester.test_upload_lines),
+        ("Import Repeated Id", tester.test_import_repeated_id),
+        ("Import Checks", tester.test_import_checks),
+        ("Week Copy Skips", tester.test_week_copy_skips),
+        ("Template Keeps Status", tester.test_template_keeps_status),
     ]
     
     failed_tests = []
@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_workers(args, port):
+    """Run the app under uvicorn with several worker processes and the capped broadcast"""
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+        "CACHE_BROADCAST": "capped",
+        # Workers must agree on the signing key or tokens only work on one of them
+        "JWT_SECRET": "workers-test-secret",
+        "BCRYPT_ROUNDS": "4",
+        "PROFILING_ENABLED": "0",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def fresh_get(base_url, path, token, params=None):
+    """GET on a new connection so the kernel may hand it to any worker"""
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        return client.get(
+            path,
+            params=params,
+            headers={"Authorization": f"Bearer {token}", "Connection": "close"},
+        )
+
+
+class WorkerConsistencyTest:
+    def __init__(self, base_url, workers, probes, settle):
+        self.base_url = base_url
+        self.workers = workers
+        self.probes = probes
+        self.settle = settle
+        self.failures = []
+        self.origins = set()
+
+    def wait_ready(self, timeout=30):
+        deadline = time.time() + timeout
+        ready = 0
+        while time.time() < deadline:
+            try:
+                if httpx.get(self.base_url.replace("/api", "/readyz"), timeout=2).status_code == 200:
+                    ready += 1
+                    if ready >= self.workers * 2:
+                        return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("workers did not become ready")
+
+    def login(self, client, email, password):
+        response = client.post("/auth/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        return response.json()["token"]
+
+    def check_everywhere(self, name, token, probe):
+        """Repeat probe on fresh connections until every answer agrees or settle runs out"""
+        deadline = time.time() + self.settle
+        while True:
+            results = [probe(token) for _ in range(self.probes)]
+            bad = [result for result in results if not result]
+            if not bad:
+                print(f"✅ {name}")
+                return
+            if time.time() > deadline:
+                print(f"❌ {name}: {len(bad)}/{len(results)} stale answers")
+                self.failures.append(name)
+                return
+            time.sleep(0.1)
+
+    def record_origin(self, token):
+        response = fresh_get(self.base_url, "/cache/stats", token)
+        self.origins.add(response.json()["broadcast"]["origin"])
+
+    def run(self):
+        self.wait_ready()
+        week_start = (date.today() - timedelta(days=date.today().weekday())).isoformat()
+        schedule_params = {"store_id": "store-1", "week_start": week_start}
+
+        with httpx.Client(base_url=self.base_url, timeout=10) as client:
+            client.post("/seed").raise_for_status()
+            admin_token = self.login(client, "admin@example.com", "admin123")
+            user_token = self.login(client, "john@example.com", "user123")
+            admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+            # Warm every worker's week snapshot so a stale copy would be served
+            for _ in range(self.probes):
+                fresh_get(self.base_url, "/schedule", user_token, schedule_params)
+                self.record_origin(admin_token)
+            print(f"Reached {len(self.origins)} of {self.workers} workers")
+            if len(self.origins) < 2:
+                self.failures.append("requests did not spread over several workers")
+
+            response = client.post("/shifts", headers=admin_headers, json={
+                "store_id": "store-1",
+                "day_of_week": 2,
+                "time_slot": "09:00 - 13:00",
+                "shift_type": "morning",
+                "week_start": week_start,
+            })
+            response.raise_for_status()
+            shift_id = response.json()["id"]
+
+            def schedule_has_shift(token, expected):
+                grid = fresh_get(self.base_url, "/schedule", token, schedule_params).json()
+                ids = {
+                    shift["id"]
+                    for day in grid["days"]
+                    for shifts in day["slots"].values()
+                    for shift in shifts
+                }
+                return (shift_id in ids) == expected
+
+            self.check_everywhere("created shift visible on every worker", user_token,
+                                  lambda token: schedule_has_shift(token, True))
+
+            # The snapshot answers conflict checks, so a stale one would allow a double booking
+            self.check_everywhere("slot reported taken on every worker", user_token, lambda token: httpx.post(
+                f"{self.base_url}/shifts/check-conflict",
+                headers={"Authorization": f"Bearer {token}", "Connection": "close"},
+                json={"store_id": "store-1", "day_of_week": 2, "time_slot": "09:00 - 13:00", "week_start": week_start},
+            ).json()["has_conflict"])
+
+            client.delete(f"/shifts/{shift_id}", headers=admin_headers).raise_for_status()
+            self.check_everywhere("deleted shift gone on every worker", user_token,
+                                  lambda token: schedule_has_shift(token, False))
+
+            client.post("/auth/logout", headers={"Authorization": f"Bearer {user_token}"}).raise_for_status()
+            self.check_everywhere("revoked token rejected on every worker", user_token,
+                                  lambda token: fresh_get(self.base_url, "/auth/me", token).status_code == 401)
+
+        return not self.failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-worker cache consistency check")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="shiftsync_workers_test")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--probes", type=int, default=24, help="fresh connections per check")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds allowed for invalidations to spread")
+    args = parser.parse_args()
+
+    port = free_port()
+    process = start_workers(args, port)
+    try:
+        test = WorkerConsistencyTest(f"http://127.0.0.1:{port}/api", args.workers, args.probes, args.settle)
+        passed = test.run()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    print("🎉 Workers stayed consistent" if passed else f"⚠️ Failed: {', '.join(test.failures)}")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
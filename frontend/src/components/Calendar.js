@@ -37,6 +37,67 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [store, currentWeekStart]);
 
+  // Changes are applied by id, so our own writes arriving again over the
+  // event stream are harmless
+  const applyShiftChange = (action, shift) => {
+    setShifts((current) => {
+      const others = current.filter((s) => s.id !== shift.id);
+      return action === 'deleted' ? others : [...others, shift];
+    });
+  };
+
+  useEffect(() => {
+    if (!store || !token) return;
+
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    // The stream is opened with a short-lived token scoped to this week, so
+    // the bearer token never appears in a URL. A rejected reconnect closes
+    // the EventSource; open a new one with a fresh token.
+    const connect = async () => {
+      try {
+        const response = await axios.post(
+          `${API}/shifts/events/token`,
+          null,
+          {
+            params: { store_id: store.id, week_start: currentWeekStart },
+            headers: { Authorization: `Bearer ${token}` },
+          }
+        );
+        if (closed) return;
+
+        source = new EventSource(
+          `${API}/shifts/events?store_id=${store.id}&week_start=${currentWeekStart}&token=${encodeURIComponent(response.data.token)}`
+        );
+        ['created', 'updated', 'deleted'].forEach((type) =>
+          source.addEventListener(type, (event) => {
+            const { action, shift } = JSON.parse(event.data);
+            applyShiftChange(action, shift);
+          })
+        );
+        source.addEventListener('resync', () => fetchShifts());
+        source.onerror = () => {
+          if (source.readyState === EventSource.CLOSED && !closed) {
+            retryTimer = setTimeout(connect, 3000);
+          }
+        };
+      } catch (error) {
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      }
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [store, currentWeekStart, token]);
+
   const fetchShifts = async () => {
     setLoading(true);
     try {
@@ -74,24 +135,7 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
     }
 
     try {
-      const conflictCheck = await axios.post(
-        `${API}/shifts/check-conflict`,
-        {
-          store_id: store.id,
-          day_of_week: parseInt(dayIndex),
-          time_slot: timeSlot,
-          week_start: currentWeekStart,
-          exclude_shift_id: shiftId
-        },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
-
-      if (conflictCheck.data.has_conflict) {
-        toast.error('Conflict detected! This slot is already taken.');
-        return;
-      }
-
-      await axios.put(
+      const response = await axios.put(
         `${API}/shifts/${shiftId}`,
         {
           day_of_week: parseInt(dayIndex),
@@ -101,8 +145,12 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
       );
 
       toast.success('Shift moved successfully');
-      fetchShifts();
+      applyShiftChange('updated', response.data);
     } catch (error) {
+      if (error.response?.status === 409) {
+        toast.error(error.response.data.detail.message);
+        return;
+      }
       toast.error('Failed to move shift');
     }
   };
@@ -127,7 +175,7 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
         headers: { Authorization: `Bearer ${token}` }
       });
       toast.success('Shift deleted');
-      fetchShifts();
+      applyShiftChange('deleted', { id: shiftId });
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to delete shift');
     }
@@ -135,11 +183,11 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
 
   const handleApproveShift = async (shiftId) => {
     try {
-      await axios.post(`${API}/shifts/${shiftId}/approve`, {}, {
+      const response = await axios.post(`${API}/shifts/${shiftId}/approve`, {}, {
         headers: { Authorization: `Bearer ${token}` }
       });
       toast.success('Shift approved');
-      fetchShifts();
+      applyShiftChange('updated', response.data);
     } catch (error) {
       toast.error('Failed to approve shift');
     }
@@ -147,11 +195,11 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
 
   const handleRejectShift = async (shiftId) => {
     try {
-      await axios.post(`${API}/shifts/${shiftId}/reject`, {}, {
+      const response = await axios.post(`${API}/shifts/${shiftId}/reject`, {}, {
         headers: { Authorization: `Bearer ${token}` }
       });
       toast.success('Shift rejected');
-      fetchShifts();
+      applyShiftChange('updated', response.data);
     } catch (error) {
       toast.error('Failed to reject shift');
     }
@@ -301,7 +349,7 @@ export const Calendar = ({ store, currentWeekStart, onWeekChange }) => {
         selectedSlot={selectedSlot}
         editingShift={editingShift}
         currentWeekStart={currentWeekStart}
-        onSuccess={fetchShifts}
+        onSuccess={(shift) => applyShiftChange('updated', shift)}
       />
     </div>
   );
@@ -53,32 +53,16 @@ export const ShiftModal = ({
     setLoading(true);
 
     try {
+      let response;
       if (editingShift) {
-        await axios.put(
+        response = await axios.put(
           `${API}/shifts/${editingShift.id}`,
           { day_of_week: dayOfWeek, time_slot: timeSlot, shift_type: shiftType, notes },
           { headers: { Authorization: `Bearer ${token}` } }
         );
         toast.success('Shift updated successfully');
       } else {
-        const conflictCheck = await axios.post(
-          `${API}/shifts/check-conflict`,
-          {
-            store_id: store.id,
-            day_of_week: dayOfWeek,
-            time_slot: timeSlot,
-            week_start: currentWeekStart,
-          },
-          { headers: { Authorization: `Bearer ${token}` } }
-        );
-
-        if (conflictCheck.data.has_conflict) {
-          toast.error('Conflict detected! This slot is already taken.');
-          setLoading(false);
-          return;
-        }
-
-        await axios.post(
+        response = await axios.post(
           `${API}/shifts`,
           {
             store_id: store.id,
@@ -93,10 +77,11 @@ export const ShiftModal = ({
         toast.success('Shift request created successfully');
       }
 
-      onSuccess();
+      onSuccess(response.data);
       onOpenChange(false);
     } catch (error) {
-      toast.error(error.response?.data?.detail || 'Failed to save shift');
+      const detail = error.response?.data?.detail;
+      toast.error(detail?.message || detail || 'Failed to save shift');
     } finally {
       setLoading(false);
     }